@@ -1,74 +1,197 @@
+import io
 import os
 import subprocess
+import sys
 import threading
 import numpy as np
 import select
 import fcntl
+import time
+
+from firmware.audio.convert import to_mono
+
+BLUEALSA_SERVICE = "org.bluealsa"
+FMT_S16_LE = 0x8210  # bluealsa: signed | 16 bit | 2 bajty, little endian
 
 
 class BlueAlsaInput:
-    def __init__(self, bt_addr: str | None, rate: int = 44100, channels: int = 2, chunk_frames: int = 1024):
+    """
+    A2DP capture from bluealsa, S16_LE interleaved -> float32 mono blocks.
+
+    Backends:
+      dbus     PCM fd straight from bluealsa (org.bluealsa.PCM1.Open), no
+               extra process and no pipe
+      arecord  arecord -t raw subprocess (fallback, e.g. no dbus-python or
+               an older bluealsa)
+    "auto" (default, or VIS_BT_BACKEND) tries dbus first.
+
+    Both end up as a file descriptor that is read with readinto() straight
+    into a preallocated ring of whole blocks, so a block is converted from
+    the ring in place, without intermediate bytes objects.
+    """
+    def __init__(self, bt_addr: str | None, rate: int = 44100, channels: int = 2, chunk_frames: int = 1024,
+                 backend: str | None = None, ring_blocks: int = 4, downmix: str = "mid"):
         self.bt_addr = bt_addr or os.environ.get("VIS_BT_ADDR")
         self.rate = int(rate)
         self.channels = int(channels)
         self.chunk_frames = int(chunk_frames)
+        self.backend_pref = (backend or os.environ.get("VIS_BT_BACKEND") or "auto").lower()
+        self.backend = ""
+        self.downmix = downmix
 
         self._arec: subprocess.Popen | None = None
+        self._pcm: io.FileIO | None = None
+        self._ctrl_fd = -1
+        self._bus = None
+        self._pcm_path = None
         self._lock = threading.Lock()
-        self._buf = bytearray()
+
+        # ring: całe bloki, konsument zawsze zdejmuje pełny blok -> blok nigdy się nie zawija
+        self._need = self.chunk_frames * self.channels * 2
+        self._ring = np.zeros(max(2, int(ring_blocks)) * self.chunk_frames * self.channels, dtype=np.int16)
+        self._mv = memoryview(self._ring).cast("B")
+        self._cap = self._mv.nbytes
+        self._r = 0
+        self._w = 0
+        self._avail = 0
+        self.overruns = 0
+        self.underruns = 0
 
     def _set_nonblocking(self, fd: int):
         flags = fcntl.fcntl(fd, fcntl.F_GETFL)
         fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
 
+    def _reset_ring(self):
+        self._r = self._w = self._avail = 0
+
+    def _open_dbus(self):
+        import dbus
+
+        # własne połączenie: wątek BT nie dzieli kolejki z serwerem GATT (GLib)
+        bus = dbus.SystemBus(private=True)
+        self._bus = bus
+        mgr = dbus.Interface(bus.get_object(BLUEALSA_SERVICE, "/org/bluealsa"), "org.bluealsa.Manager1")
+        dev = "dev_" + self.bt_addr.upper().replace(":", "_")
+        for path, props in mgr.GetPCMs().items():
+            if not str(props.get("Device", "")).endswith(dev):
+                continue
+            if str(props.get("Mode", "")) != "source" or "A2DP" not in str(props.get("Transport", "")):
+                continue
+            fmt = int(props.get("Format", 0))
+            ch = int(props.get("Channels", 0))
+            rate = int(props.get("Rate", props.get("Sampling", 0)))
+            if fmt != FMT_S16_LE or ch != self.channels or rate != self.rate:
+                raise RuntimeError(f"BlueAlsaInput: PCM {path} is fmt=0x{fmt:04x} ch={ch} rate={rate}")
+
+            pcm = dbus.Interface(bus.get_object(BLUEALSA_SERVICE, path), "org.bluealsa.PCM1")
+            fd, ctrl = pcm.Open()
+            self._pcm_path = path
+            self._ctrl_fd = ctrl.take()
+            self._pcm = io.FileIO(fd.take(), "rb", closefd=True)
+            self._set_nonblocking(self._pcm.fileno())
+            return
+        raise RuntimeError(f"BlueAlsaInput: no A2DP source PCM for {self.bt_addr}")
+
+    def _open_arecord(self):
+        dev = f"bluealsa:DEV={self.bt_addr},PROFILE=a2dp,SRV={BLUEALSA_SERVICE}"
+        fmt = "S16_LE"
+
+        self._arec = subprocess.Popen(
+            [
+                "arecord",
+                "-D", dev,
+                "-f", fmt,
+                "-c", str(self.channels),
+                "-r", str(self.rate),
+                "-t", "raw",
+                "-q",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,   # <= zmiana (debug)
+            bufsize=0,
+        )
+
+        if self._arec.stdout is None:
+            raise RuntimeError("BlueAlsaInput: arecord has no stdout")
+
+        self._pcm = self._arec.stdout
+        self._set_nonblocking(self._pcm.fileno())
+        if self._arec.stderr is not None:
+            self._set_nonblocking(self._arec.stderr.fileno())
+
     def start(self):
         with self._lock:
-            if self._arec is not None:
+            if self._pcm is not None:
                 return
             if not self.bt_addr:
                 raise RuntimeError("BlueAlsaInput: bt_addr is None (set VIS_BT_ADDR or pass bt_addr)")
 
-            dev = f"bluealsa:DEV={self.bt_addr},PROFILE=a2dp,SRV=org.bluealsa"
-            fmt = "S16_LE"
-
-            self._arec = subprocess.Popen(
-                [
-                    "arecord",
-                    "-D", dev,
-                    "-f", fmt,
-                    "-c", str(self.channels),
-                    "-r", str(self.rate),
-                    "-t", "raw",
-                    "-q",
-                ],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,   # <= zmiana (debug)
-                bufsize=0,
-            )
-
-            if self._arec.stdout is None:
-                raise RuntimeError("BlueAlsaInput: arecord has no stdout")
-
-            self._set_nonblocking(self._arec.stdout.fileno())
-            if self._arec.stderr is not None:
-                self._set_nonblocking(self._arec.stderr.fileno())
-
-            self._buf.clear()
+            self._reset_ring()
+            if self.backend_pref in ("auto", "dbus"):
+                try:
+                    self._open_dbus()
+                    self.backend = "dbus"
+                    return
+                except Exception as e:
+                    self._close_locked()
+                    if self.backend_pref == "dbus":
+                        raise
+                    print(f"[BlueAlsaInput] dbus PCM unavailable ({e}), using arecord", file=sys.stderr)
+
+            self._open_arecord()
+            self.backend = "arecord"
+
+    def _close_locked(self):
+        p = self._arec
+        if p is not None:
+            try:
+                p.terminate()
+            except Exception:
+                pass
+        elif self._pcm is not None:
+            try:
+                self._pcm.close()
+            except Exception:
+                pass
+        if self._ctrl_fd >= 0:
+            try:
+                os.close(self._ctrl_fd)
+            except Exception:
+                pass
+        if self._bus is not None:
+            try:
+                self._bus.close()
+            except Exception:
+                pass
+        self._arec = None
+        self._pcm = None
+        self._ctrl_fd = -1
+        self._bus = None
+        self._pcm_path = None
+        self._reset_ring()
 
     def stop(self):
         with self._lock:
-            p = self._arec
-            if p is not None:
-                try:
-                    p.terminate()
-                except Exception:
-                    pass
-            self._arec = None
-            self._buf.clear()
+            self._close_locked()
+
+    def delay_ms(self) -> float | None:
+        """bluealsa's PCM Delay property (1/10 ms units); None with arecord or on error."""
+        bus, path = self._bus, self._pcm_path
+        if bus is None or path is None:
+            return None
+        try:
+            import dbus
+
+            props = dbus.Interface(bus.get_object(BLUEALSA_SERVICE, path), "org.freedesktop.DBus.Properties")
+            return int(props.Get("org.bluealsa.PCM1", "Delay")) / 10.0
+        except Exception:
+            return None
 
     def is_running(self) -> bool:
         with self._lock:
-            return self._arec is not None and (self._arec.poll() is None)
+            if self._pcm is None:
+                return False
+            return self._arec is None or self._arec.poll() is None
 
     def _drain_stderr(self, p: subprocess.Popen):
         # tylko do diagnozy: jeśli arecord się wysypuje, tu zobaczysz dlaczego
@@ -86,63 +209,85 @@ class BlueAlsaInput:
         except Exception:
             pass
 
-    def read_mono_f32(self) -> np.ndarray:
-        with self._lock:
-            p = self._arec
-            if p is None or p.stdout is None:
-                return np.zeros(self.chunk_frames, dtype=np.float32)
-
-            if p.poll() is not None:
-                # spróbuj wypisać powód
-                try:
-                    if p.stderr is not None:
-                        err = p.stderr.read().decode("utf-8", "ignore").strip()
-                        if err:
-                            print(f"[BlueAlsaInput] arecord exited: {err}", file=sys.stderr)
-                except Exception:
-                    pass
-                return np.zeros(self.chunk_frames, dtype=np.float32)
-
-            need_samples = self.chunk_frames * self.channels
-            need_bytes = need_samples * 2
-
-            fd = p.stdout.fileno()
-
-            # mini-timeout zamiast 0.0
+    def _fill(self, f) -> bool:
+        """
+        readinto() z fd do ringu, aż fd będzie pusty; zaległość ponad pojemność ringu
+        wypada (najstarsze bloki), zamiast czekać w pipe/sockecie jako dodatkowe opóźnienie.
+        False gdy EOF (PCM zamknięte).
+        """
+        for _ in range(64):
+            if self._avail >= self._cap:
+                if not select.select([f], [], [], 0.0)[0]:
+                    return True
+                # konsument nie nadąża: wyrzucamy najstarszy blok (liczy się najnowsze audio)
+                self._r = (self._r + self._need) % self._cap
+                self._avail -= self._need
+                self.overruns += 1
+            end = self._cap if self._w >= self._r or self._avail == 0 else self._r
+            end = min(end, self._w + (self._cap - self._avail))
             try:
-                r, _, _ = select.select([fd], [], [], 0.002)
-                if r:
-                    for _ in range(32):
-                        try:
-                            chunk = os.read(fd, 8192)
-                        except BlockingIOError:
-                            break
-                        except Exception:
-                            break
-                        if not chunk:
-                            break
-                        self._buf.extend(chunk)
-                        if len(self._buf) >= need_bytes:
-                            break
-            except Exception:
-                return np.zeros(self.chunk_frames, dtype=np.float32)
+                n = f.readinto(self._mv[self._w : end])
+            except BlockingIOError:
+                return True
+            if n is None:
+                return True
+            if n == 0:
+                return False
+            self._w = (self._w + n) % self._cap
+            self._avail += n
+        return True
 
-            if len(self._buf) < need_bytes:
-                return np.zeros(self.chunk_frames, dtype=np.float32)
+    def _take(self, out: np.ndarray):
+        # int16 -> float32 mono prosto do out (wspólny kernel z mikrofonem)
+        s = self._r // 2
+        to_mono(self._ring[s : s + self.chunk_frames * self.channels], out, self.channels, self.downmix)
+        self._r = (self._r + self._need) % self._cap
+        self._avail -= self._need
 
-            buf = bytes(self._buf[:need_bytes])
-            del self._buf[:need_bytes]
+    def read_block(self, out: np.ndarray, timeout: float = 0.1) -> bool:
+        """
+        Blocks until a whole chunk is available and converts it into out
+        (float32, chunk_frames). False when the deadline passes first (counted
+        in underruns) or the PCM is gone; out is then left untouched.
+        """
+        deadline = time.monotonic() + float(timeout)
+        while True:
+            with self._lock:
+                f = self._pcm
+                p = self._arec
+                if f is None:
+                    return False
+                if p is not None and p.poll() is not None:
+                    # powód z stderr, ale bez blokującego read() pod lockiem
+                    print(f"[BlueAlsaInput] arecord exited ({p.returncode})", file=sys.stderr)
+                    self._drain_stderr(p)
+                    self._close_locked()
+                    return False
+                try:
+                    alive = self._fill(f)
+                except OSError:
+                    alive = False
+                if not alive:
+                    self._close_locked()
+                    return False
+                if self._avail >= self._need:
+                    self._take(out)
+                    return True
+                fd = f.fileno()
 
-        x = np.frombuffer(buf, dtype=np.int16).astype(np.float32) / 32768.0
-        if self.channels > 1:
+            # czekamy bez locka, żeby stop() nie czekał na timeout
+            rem = deadline - time.monotonic()
+            if rem <= 0:
+                self.underruns += 1
+                return False
             try:
-                x = x.reshape(self.chunk_frames, self.channels).mean(axis=1)
-            except Exception:
-                return np.zeros(self.chunk_frames, dtype=np.float32)
-        else:
-            x = x[: self.chunk_frames]
-
-        if not np.isfinite(x).all():
-            return np.zeros(self.chunk_frames, dtype=np.float32)
+                select.select([fd], [], [], rem)
+            except (OSError, ValueError):
+                return False
 
+    def read_mono_f32(self) -> np.ndarray:
+        """Old non-blocking API (2 ms): zeros when a full block is not ready."""
+        x = np.zeros(self.chunk_frames, dtype=np.float32)
+        if not self.read_block(x, timeout=0.002):
+            x[:] = 0.0
         return x
@@ -0,0 +1,250 @@
+# firmware/audio/bt_source.py
+# Supervised Bluetooth (A2DP) audio source.
+#
+# One thread owns the whole BT pipeline: bluetoothctl connect, waiting for the
+# bluealsa PCM, BlueAlsaInput start/restart and the blocking block reads.
+# Failures are retried with exponential backoff; the render loop only calls
+# set_addr() / get_latest() and reads a few flags, none of which block.
+
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+import numpy as np
+
+from firmware.audio.bt_bluealsa import BlueAlsaInput
+from firmware.audio.ring import AudioRing
+
+BT_READ_TIMEOUT = 0.1      # ~4 bloki po 1024 próbek
+BT_SILENCE_AFTER_S = 0.5   # tyle bez audio -> zerujemy bufor
+BT_CHECK_S = 2.0           # przy braku audio: co tyle sprawdzamy, czy urządzenie jest połączone
+CMD_TIMEOUT_S = 5.0
+RING_S = 2.0               # historia próbek (tryb mix, linia opóźniająca)
+DELAY_POLL_S = 5.0         # odczyt Delay z bluealsa
+
+
+def bt_is_connected(addr: str) -> bool:
+    if not addr:
+        return False
+    try:
+        out = subprocess.check_output(["bluetoothctl", "info", addr], text=True,
+                                      stderr=subprocess.DEVNULL, timeout=CMD_TIMEOUT_S)
+        return "Connected: yes" in out
+    except Exception:
+        return False
+
+
+def bt_has_a2dp_pcm(addr: str) -> bool:
+    if not addr:
+        return False
+    try:
+        out = subprocess.check_output(["bluealsa-aplay", "-L"], text=True,
+                                      stderr=subprocess.DEVNULL, timeout=CMD_TIMEOUT_S)
+        return f"DEV={addr}" in out and "PROFILE=a2dp" in out
+    except Exception:
+        return False
+
+
+def bt_connect(addr: str) -> bool:
+    """One connect attempt (retries are the caller's backoff)."""
+    if not addr:
+        return False
+    for cmd in (["bluetoothctl", "power", "on"], ["bluetoothctl", "connect", addr]):
+        try:
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=CMD_TIMEOUT_S * 2)
+        except Exception:
+            pass
+    return bt_is_connected(addr)
+
+
+class BtSource:
+    """
+    status: off | standby | connecting | waiting_pcm | capturing
+    capturing: PCM open (audio or silence, e.g. paused player)
+    streaming: a real block arrived within BT_SILENCE_AFTER_S
+
+    active=False (set_addr) is warm standby: capture is opened and kept
+    running if the device is already connected, but the source never
+    connects on its own, so switching to BT is instant when it is there.
+    """
+    def __init__(self, sr: int, nfft: int, backoff_min: float = 1.0, backoff_max: float = 30.0):
+        self.sr = int(sr)
+        self.nfft = int(nfft)
+        self.backoff_min = float(backoff_min)
+        self.backoff_max = float(backoff_max)
+
+        self._lock = threading.Lock()
+        self._latest = np.zeros(self.nfft, dtype=np.float32)
+        self._t_audio = 0.0
+        self.ring = AudioRing(int(RING_S * self.sr))
+        self._t_ring = 0.0         # monotonic ostatniego zapisu do ring (= czas najnowszej próbki)
+        self.delay_auto_ms = None  # z bluealsa (tylko backend dbus)
+
+        self._addr: str | None = None
+        self._active = False
+        self._inp: BlueAlsaInput | None = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self.status = "off"
+        self.blocks = 0
+        self.underruns = 0
+        self.restarts = 0
+        self.reconnects = 0
+
+    # ---------- render loop side (never blocks) ----------
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def set_addr(self, addr: str | None, active: bool = True):
+        addr = addr or None
+        active = bool(active)
+        if addr != self._addr or active != self._active:
+            self._addr = addr
+            self._active = active
+            self._wake.set()
+
+    @property
+    def capturing(self) -> bool:
+        return self.status == "capturing"
+
+    @property
+    def streaming(self) -> bool:
+        return self.capturing and (time.monotonic() - self._t_audio) < BT_SILENCE_AFTER_S
+
+    def get_latest(self, out: np.ndarray):
+        with self._lock:
+            np.copyto(out, self._latest)
+        return out
+
+    @property
+    def t_latest(self) -> float:
+        return self._t_ring
+
+    def read(self, out: np.ndarray, delay: int = 0) -> float:
+        """
+        Block ending `delay` samples before the newest one (delay line over
+        the ring) -> capture time of its last sample (time.monotonic()).
+        """
+        t = self._t_ring
+        self.ring.read(out, delay=delay)
+        return t - delay / self.sr
+
+    def close(self, timeout: float = 1.0):
+        self._stop.set()
+        self._wake.set()
+        t = self._thread
+        if t is not None:
+            t.join(timeout=timeout)
+        self._close_input()
+
+    # ---------- supervisor thread ----------
+
+    def _sleep(self, s: float):
+        # przerywane przez set_addr()/close()
+        self._wake.wait(s)
+        self._wake.clear()
+
+    def _close_input(self):
+        inp = self._inp
+        self._inp = None
+        if inp is not None:
+            try:
+                inp.stop()
+            except Exception:
+                pass
+        with self._lock:
+            self._latest[:] = 0.0
+
+    def _open(self, addr: str) -> bool:
+        if not bt_is_connected(addr):
+            if not self._active:
+                self.status = "standby"
+                return False
+            self.status = "connecting"
+            self.reconnects += 1
+            if not bt_connect(addr):
+                return False
+        if not bt_has_a2dp_pcm(addr):
+            self.status = "waiting_pcm"
+            return False
+        inp = BlueAlsaInput(bt_addr=addr, rate=self.sr, channels=2, chunk_frames=self.nfft)
+        inp.start()
+        self._inp = inp
+        self.restarts += 1
+        self.status = "capturing"
+        return True
+
+    def _run(self):
+        buf = np.zeros(self.nfft, dtype=np.float32)
+        backoff = self.backoff_min
+        t_check = 0.0
+        t_delay = 0.0
+        while not self._stop.is_set():
+            addr = self._addr
+            if not addr:
+                self._close_input()
+                self.status = "off"
+                backoff = self.backoff_min
+                self._sleep(1.0)
+                continue
+
+            inp = self._inp
+            if inp is None or inp.bt_addr != addr:
+                self._close_input()
+                try:
+                    ok = self._open(addr)
+                except Exception as e:
+                    print(f"[BtSource] capture start failed: {e}", file=sys.stderr)
+                    traceback.print_exc()
+                    ok = False
+                if not ok:
+                    self._sleep(backoff)
+                    backoff = min(self.backoff_max, backoff * 2.0)
+                    continue
+                self._t_audio = t_check = time.monotonic()
+                continue
+
+            try:
+                ok = inp.read_block(buf, timeout=BT_READ_TIMEOUT)
+            except Exception:
+                ok = False
+
+            now = time.monotonic()
+            if ok:
+                self.ring.write(buf)
+                self._t_ring = now
+                with self._lock:
+                    self._latest, buf = buf, self._latest
+                self._t_audio = t_check = now
+                self.blocks += 1
+                backoff = self.backoff_min
+                if now - t_delay >= DELAY_POLL_S:
+                    t_delay = now
+                    self.delay_auto_ms = inp.delay_ms()
+                continue
+
+            self.underruns += 1
+            if not inp.is_running():
+                # PCM zamknięte / arecord padł -> restart z backoffem
+                self._close_input()
+                self.status = "connecting"
+                self._sleep(backoff)
+                backoff = min(self.backoff_max, backoff * 2.0)
+                continue
+
+            if now - self._t_audio >= BT_SILENCE_AFTER_S:
+                with self._lock:
+                    self._latest[:] = 0.0
+            # pauza w odtwarzaczu też daje ciszę; restart tylko gdy urządzenie naprawdę odpadło
+            if now - t_check >= BT_CHECK_S:
+                t_check = now
+                if not bt_is_connected(addr):
+                    self._close_input()
+                    self.status = "connecting"
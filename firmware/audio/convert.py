@@ -0,0 +1,58 @@
+# firmware/audio/convert.py
+# Sample conversion shared by all audio sources (mic callback, bluealsa).
+#
+# to_mono():  int16 / float32 interleaved -> float32 mono, written into a
+#             preallocated buffer with the downmix and int16 scaling, no
+#             temporary arrays
+# dc_gain():  in-place DC removal + gain for a block that is already mono
+
+import numpy as np
+
+DOWNMIX = ("mid", "side", "left", "right")
+
+INT16_SCALE = 1.0 / 32768.0
+
+
+def to_mono(src: np.ndarray, out: np.ndarray, channels: int = 2, downmix: str = "mid") -> np.ndarray:
+    """
+    src: int16 or float32 samples, interleaved 1-D (frames*channels) or
+    (frames, channels). out: float32, frames long; a shorter src is
+    zero-padded, a longer one truncated.
+
+    downmix: mid = average of all channels, side = (L-R)/2, left, right.
+    int16 is scaled to [-1, 1) in the same multiply as the downmix.
+    """
+    ch = max(1, int(channels))
+    a = src.reshape(-1, ch)
+    n = out.shape[0]
+    m = min(n, a.shape[0])
+    a = a[:m]
+    o = out[:m]
+
+    k = INT16_SCALE if a.dtype == np.int16 else 1.0
+    if ch == 1 or downmix == "left":
+        np.copyto(o, a[:, 0], casting="same_kind")
+    elif downmix == "right":
+        np.copyto(o, a[:, 1], casting="same_kind")
+    elif downmix == "side":
+        np.subtract(a[:, 0], a[:, 1], out=o, dtype=np.float32)
+        k *= 0.5
+    else:
+        np.add(a[:, 0], a[:, 1], out=o, dtype=np.float32)
+        for c in range(2, ch):
+            o += a[:, c]
+        k /= ch
+
+    if k != 1.0:
+        o *= k
+    if m < n:
+        out[m:] = 0.0
+    return out
+
+
+def dc_gain(x: np.ndarray, gain: float = 1.0) -> np.ndarray:
+    """x -= mean(x); x *= gain, in place."""
+    x -= x.mean()
+    if gain != 1.0:
+        x *= float(gain)
+    return x
@@ -1,3 +1,4 @@
+import time
 import numpy as np
 
 def _hz_to_bin(freq_hz, nfft, sr):
@@ -14,6 +15,12 @@ class FeatureExtractor:
         self.window = np.hanning(self.nfft).astype(np.float32)
         self.prev_bands = np.zeros(self.bands, dtype=np.float32)
 
+        # onset/beat: spectral flux po znormalizowanych pasmach + adaptacyjny próg
+        self.prev_norm = np.zeros(self.bands, dtype=np.float32)
+        self.flux_avg = 0.0
+        self.beat_refractory = 0.12
+        self._t_beat = 0.0
+
         # LINEAR spacing: 1250Hz do 20kHz = 18750 Hz / 16 pasm = ~1172 Hz na pasmo
         edges_hz = np.linspace(self.fmin, self.fmax, num=self.bands + 1)
         self.edges = []
@@ -35,6 +42,10 @@ class FeatureExtractor:
         xw = x * self.window
         spec = np.fft.rfft(xw)
         mag2 = (spec.real * spec.real + spec.imag * spec.imag).astype(np.float32)
+        return self.from_power(mag2, rms, smoothing)
+
+    def from_power(self, mag2, rms, smoothing=0.65):
+        """Features from a power spectrum (rfft of the windowed block); keeps this extractor's state."""
         mag2[0] = 0.0  # usuń DC
 
         band_vals = np.zeros(self.bands, dtype=np.float32)
@@ -65,6 +76,16 @@ class FeatureExtractor:
         if rms < RMS_GATE:
             bands_norm[:] = 0.0
 
+        flux = float(np.sum(np.maximum(bands_norm - self.prev_norm, 0.0)))
+        self.prev_norm = bands_norm.copy()
+        beat = False
+        now = time.monotonic()
+        # przerwa po trafieniu, bez podwójnych beatów na jednym uderzeniu
+        if flux > 1.5 * self.flux_avg + 0.15 and (now - self._t_beat) >= self.beat_refractory:
+            beat = True
+            self._t_beat = now
+        self.flux_avg = 0.9 * self.flux_avg + 0.1 * flux
+
         # bass/mid/treble - teraz wszystkie pasma są w zakresie 1.25-20kHz
         # więc bass = dolne 1/3, mid = środkowe 1/3, treble = górne 1/3
         third = max(1, self.bands // 3)
@@ -78,7 +99,20 @@ class FeatureExtractor:
             "bass": bass,
             "mid": mid,
             "treble": treble,
+            "flux": flux,
+            "beat": beat,
             "samplerate": self.sr,
             "nfft": self.nfft,
             "mag": mag2,
-        }
\ No newline at end of file
+        }
+
+def compute_batch(extractors, xs, smoothing=0.65):
+    """
+    Several blocks (rows of xs, same nfft) through one batched rfft; row i
+    goes to extractors[i], each with its own smoothing/beat state.
+    """
+    xs = np.asarray(xs, dtype=np.float32)
+    rms = np.sqrt(np.mean(xs * xs, axis=1) + 1e-12)
+    spec = np.fft.rfft(xs * extractors[0].window, axis=1)
+    mag2 = (spec.real * spec.real + spec.imag * spec.imag).astype(np.float32)
+    return [fe.from_power(mag2[i], float(rms[i]), smoothing) for i, fe in enumerate(extractors)]
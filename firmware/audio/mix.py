@@ -0,0 +1,119 @@
+# firmware/audio/mix.py
+# "mix" mode: mic (the room) and BT (the playlist) analyzed together.
+#
+# The mic hears the playlist through the speakers later than bluealsa hands
+# the same samples to us (A2DP + output buffering + air). The offset is
+# estimated with GCC-PHAT cross-correlation on decimated history from both
+# rings (on its own thread, the ~32k-point FFT would stall a render frame)
+# and the BT side is read that many samples back, so both rows line up.
+# mic, bt and their sum then go through one batched rfft, each row with its
+# own FeatureExtractor state.
+
+import threading
+import time
+
+import numpy as np
+
+from firmware.audio.convert import dc_gain
+from firmware.audio.features import FeatureExtractor, compute_batch
+
+ALIGN_EVERY_S = 2.0    # jak często szacujemy opóźnienie
+ALIGN_WIN_S = 1.0      # okno mikrofonu do korelacji
+MAX_LAG_S = 0.6        # największe szukane opóźnienie BT -> mic
+ALIGN_DECIM = 4        # 44.1k -> ~11k, wystarczy do ~0.1 ms
+ALIGN_MIN_PEAK = 6.0   # pik / odchylenie korelacji; niżej = brak wiarygodnego dopasowania
+
+
+class MixAnalyzer:
+    def __init__(self, sr: int, nfft: int, bands: int = 16, fmin: float = 20, fmax: float = 20000):
+        self.sr = int(sr)
+        self.nfft = int(nfft)
+        # własne extractory: te z trybów mic/bt liczą w tej samej pętli podczas przejścia
+        # do/z mix i dzielony stan (wygładzanie, beat) dostawałby dwa różne sygnały
+        self.fe_mic, self.fe_bt, self.fe_mix = (
+            FeatureExtractor(samplerate=self.sr, nfft=self.nfft, bands=bands, fmin=fmin, fmax=fmax)
+            for _ in range(3)
+        )
+
+        self._x = np.zeros((3, self.nfft), dtype=np.float32)
+        self._t_align = 0.0
+        self.lag = 0              # próbki, o które BT jest cofany (ustawia wątek korelacji)
+        self.lag_conf = 0.0
+        self.aligned = False
+
+        self._rings = None
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def lag_ms(self) -> float:
+        return 1000.0 * self.lag / self.sr
+
+    def _estimate_lag(self, mic_ring, bt_ring):
+        d = ALIGN_DECIM
+        n = int(ALIGN_WIN_S * self.sr) // d * d
+        max_lag = int(MAX_LAG_S * self.sr) // d * d
+        m = mic_ring.read(np.zeros(n, dtype=np.float32))
+        b = bt_ring.read(np.zeros(n + max_lag, dtype=np.float32))
+        m = m.reshape(-1, d).mean(axis=1)
+        b = b.reshape(-1, d).mean(axis=1)
+        m -= m.mean()
+        b -= b.mean()
+        if not m.any() or not b.any():
+            return None
+
+        # GCC-PHAT: r[j] = sum_t m[t] * b[t + j]; opóźnienie D <-> j = max_lag - D
+        size = 1 << int(np.ceil(np.log2(m.shape[0] + b.shape[0])))
+        cross = np.conj(np.fft.rfft(m, size)) * np.fft.rfft(b, size)
+        cross /= np.abs(cross) + 1e-12
+        r = np.fft.irfft(cross, size)[: max_lag // d + 1]
+        j = int(np.argmax(r))
+        conf = float(r[j] / (np.std(r) + 1e-12))
+        return (max_lag // d - j) * d, conf
+
+    def update_alignment(self, mic_ring, bt_ring, now=None):
+        """Every ALIGN_EVERY_S wakes the correlation thread; lag changes when it finishes."""
+        now = time.monotonic() if now is None else now
+        if now - self._t_align < ALIGN_EVERY_S:
+            return
+        self._t_align = now
+        self._rings = (mic_ring, bt_ring)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                est = self._estimate_lag(*self._rings)
+            except Exception:
+                est = None
+            if est is not None:
+                self._apply(*est)
+
+    def _apply(self, lag: int, conf: float):
+        self.lag_conf = conf
+        if conf < ALIGN_MIN_PEAK:
+            return
+        if not self.aligned or abs(lag - self.lag) > self.sr // 20:
+            self.lag = lag     # pierwszy pomiar albo wyraźna zmiana (inny głośnik / bufor)
+        else:
+            self.lag = int(round(0.7 * self.lag + 0.3 * lag))
+        self.aligned = True
+
+    def compute(self, mic_ring, bt_ring, gain=1.0, smoothing=0.65) -> dict:
+        """Combined features (mic + aligned BT) with per-source ones under "sources"."""
+        self.update_alignment(mic_ring, bt_ring)
+        x = self._x
+        dc_gain(mic_ring.read(x[0]), gain)
+        dc_gain(bt_ring.read(x[1], delay=self.lag), gain)
+        np.add(x[0], x[1], out=x[2])
+        x[2] *= 0.5
+
+        f_mic, f_bt, f_mix = compute_batch((self.fe_mic, self.fe_bt, self.fe_mix), x, smoothing)
+        f_mix["sources"] = {"mic": f_mic, "bt": f_bt}
+        f_mix["lag_ms"] = self.lag_ms
+        return f_mix
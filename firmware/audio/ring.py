@@ -0,0 +1,53 @@
+import threading
+
+import numpy as np
+
+
+class AudioRing:
+    """
+    Fixed-size float32 sample history, written by a capture thread and read
+    by the analysis side. read() copies the len(out) samples that end
+    `delay` samples before the newest one (alignment, delay lines); samples
+    not captured yet or already overwritten read as zeros.
+    """
+    def __init__(self, size: int):
+        self.size = int(size)
+        self._buf = np.zeros(self.size, dtype=np.float32)
+        self._lock = threading.Lock()
+        self.written = 0  # licznik wszystkich zapisanych próbek (pozycja "teraz")
+
+    def write(self, x: np.ndarray):
+        n = x.shape[0]
+        if n >= self.size:
+            x = x[-self.size :]
+            skip = n - self.size
+            n = self.size
+        else:
+            skip = 0
+        with self._lock:
+            i = (self.written + skip) % self.size
+            k = min(n, self.size - i)
+            self._buf[i : i + k] = x[:k]
+            if k < n:
+                self._buf[: n - k] = x[k:]
+            self.written += n + skip
+
+    def read(self, out: np.ndarray, delay: int = 0) -> np.ndarray:
+        n = out.shape[0]
+        with self._lock:
+            end = self.written - max(0, int(delay))
+            start = end - n
+            lo = max(start, self.written - self.size, 0)
+            if end <= lo:
+                out[:] = 0.0
+                return out
+            if lo > start:
+                out[: lo - start] = 0.0
+            i = lo % self.size
+            m = end - lo
+            k = min(m, self.size - i)
+            o = out[lo - start :]
+            o[:k] = self._buf[i : i + k]
+            if k < m:
+                o[k:m] = self._buf[: m - k]
+        return out
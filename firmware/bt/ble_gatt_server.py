@@ -1,14 +1,16 @@
 # firmware/bt/ble_gatt_server.py
 # BlueZ GATT server (DBus) - Visualizer
-# JSON control via WRITE characteristic + STATE readable.
+# JSON control via WRITE characteristic + STATE readable/notify.
+#
+# STATE notify: only changed fields are pushed, as JSON objects that each fit
+# in one ATT packet (MTU-3), coalesced to at most one burst per NOTIFY_MIN_S.
 #
 # Requires: python3-dbus, python3-gi
 #
 # Run note: registering advertisement often requires root or proper polkit rules.
 # If it fails, run your main script with: sudo -E python3 -u -m firmware.tools.run_with_lcd_ui
 
-import json
-import threading
+import time
 import dbus
 import dbus.exceptions
 import dbus.mainloop.glib
@@ -16,6 +18,12 @@ import dbus.service
 
 from gi.repository import GLib
 
+from firmware.bt import ctrl_proto as proto
+from firmware.bt.shared_state import (  # noqa: F401  (SharedState & co. zostają do importu stąd)
+    SHARED, SPECTRUM, SharedState, SpectrumFeed, Subscription,
+    handle_cmd, json_bytes as _json_bytes, pack_delta as _pack_delta, schema_json,
+)
+
 BLUEZ_SERVICE_NAME = "org.bluez"
 DBUS_OM_IFACE = "org.freedesktop.DBus.ObjectManager"
 DBUS_PROP_IFACE = "org.freedesktop.DBus.Properties"
@@ -31,47 +39,19 @@ LE_ADV_IFACE = "org.bluez.LEAdvertisement1"
 SVC_UUID = "12345678-1234-5678-1234-56789abcdef0"
 CMD_UUID = "12345678-1234-5678-1234-56789abcdef9"   # WRITE
 STATE_UUID = "12345678-1234-5678-1234-56789abcdef8" # READ/NOTIFY(optional)
+ACK_UUID = "12345678-1234-5678-1234-56789abcdefa"   # READ/NOTIFY (ack/error dla CMD)
+PARAMS_UUID = "12345678-1234-5678-1234-56789abcdefb" # READ (schemat parametrów, JSON)
+SPECTRUM_UUID = "12345678-1234-5678-1234-56789abcdefc" # NOTIFY (live spektrum, binarnie)
 
 # Paths
 APP_PATH = "/com/visualizer/app"
 ADV_PATH = "/com/visualizer/adv"
 
-
-# ===================== SHARED STATE =====================
-
-class SharedState:
-    def __init__(self):
-        self.lock = threading.Lock()
-        self.state = {
-            "mode": "mic",
-            "effect": "bars",
-            "brightness": 0.55,
-            "intensity": 0.75,
-            "gain": 1.0,
-            "smoothing": 0.65,
-            "color_mode": "auto",
-
-            # metadata (apka może wysyłać)
-            "device_name": "",
-            "device_addr": "",
-            "artist": "",
-            "title": "",
-            "album": "",
-            "connected": False,
-        }
-
-    def update(self, patch: dict):
-        with self.lock:
-            for k, v in patch.items():
-                if k in self.state:
-                    self.state[k] = v
-
-    def snapshot(self):
-        with self.lock:
-            return dict(self.state)
-
-
-SHARED = SharedState()
+# Notify
+NOTIFY_TICK_MS = 50
+NOTIFY_MIN_S = 0.10
+ACK_MIN_S = 0.05
+DEFAULT_MTU = 23
 
 
 # ===================== HELPERS =====================
@@ -202,6 +182,21 @@ class Characteristic(dbus.service.Object):
     def StopNotify(self):
         self.notifying = False
 
+    @dbus.service.signal(DBUS_PROP_IFACE, signature="sa{sv}as")
+    def PropertiesChanged(self, interface, changed, invalidated):
+        pass
+
+    def notify_value(self, data: bytes):
+        self.PropertiesChanged(GATT_CHRC_IFACE, {"Value": _to_dbus_array_of_bytes(data)}, [])
+
+    def _note_mtu(self, options):
+        try:
+            mtu = int(options.get("mtu", 0))
+            if mtu > 0:
+                self.service.mtu = mtu
+        except Exception:
+            pass
+
 
 class Advertisement(dbus.service.Object):
     """
@@ -243,37 +238,174 @@ class Advertisement(dbus.service.Object):
 # ===================== YOUR CHARACTERISTICS =====================
 
 class CmdCharacteristic(Characteristic):
+    """
+    Accepts either a UTF-8 JSON patch or a binary TLV write (see ctrl_proto).
+    Results go to the ACK characteristic instead of being dropped silently.
+    """
     def __init__(self, bus, index, service):
         super().__init__(bus, index, CMD_UUID, ["write", "write-without-response"], service)
 
     @dbus.service.method(GATT_CHRC_IFACE, in_signature="aya{sv}")
     def WriteValue(self, value, options):
-        try:
-            b = bytes(value)
-            txt = b.decode("utf-8", errors="ignore")
-            patch = json.loads(txt)
-            if isinstance(patch, dict):
-                SHARED.update(patch)
-        except Exception:
-            pass
+        self._note_mtu(options)
+        handle_cmd(bytes(value), self.service.ack)
 
 
 class StateCharacteristic(Characteristic):
     def __init__(self, bus, index, service):
-        # notify jest opcjonalne; bez push i tak OK (read działa)
+        # read = pełny snapshot (np. po połączeniu), notify = tylko zmienione pola
         super().__init__(bus, index, STATE_UUID, ["read", "notify"], service)
+        self._snap_version = -1
+        self._snap_bytes = b""
+        self._last_notify = 0.0
+        self._sub = SHARED.subscribe()
+        GLib.timeout_add(NOTIFY_TICK_MS, self._notify_tick)
+
+    @dbus.service.method(GATT_CHRC_IFACE, in_signature="a{sv}", out_signature="ay")
+    def ReadValue(self, options):
+        self._note_mtu(options)
+        # serializacja tylko gdy stan się zmienił; długie odczyty przychodzą z offsetem
+        if SHARED.version != self._snap_version:
+            self._snap_version = SHARED.version
+            self._snap_bytes = _json_bytes(SHARED.snapshot())
+        try:
+            off = int(options.get("offset", 0))
+        except Exception:
+            off = 0
+        return _to_dbus_array_of_bytes(self._snap_bytes[off:])
+
+    @dbus.service.method(GATT_CHRC_IFACE)
+    def StartNotify(self):
+        self._sub.poll()  # klient i tak zaczyna od ReadValue
+        self.notifying = True
+
+    def _notify_tick(self):
+        if not self.notifying:
+            return True
+        now = time.monotonic()
+        if (now - self._last_notify) < NOTIFY_MIN_S:
+            return True
+        delta = self._sub.poll()
+        if not delta:
+            return True
+        self._last_notify = now
+        try:
+            for pkt in _pack_delta(delta, max(20, self.service.mtu - 3)):
+                self.notify_value(pkt)
+        except Exception as e:
+            print("STATE notify failed:", e)
+        return True
+
+
+class AckCharacteristic(Characteristic):
+    """
+    Result of CMD writes. Errors are notified at once; OK acks are coalesced
+    so a fast slider stream only gets the newest seq back every ACK_MIN_S.
+    """
+    def __init__(self, bus, index, service):
+        super().__init__(bus, index, ACK_UUID, ["read", "notify"], service)
+        self._last = proto.encode_ack(proto.K_ACK, 0)
+        self._pending_seq = None
+        self._last_sent = 0.0
+        GLib.timeout_add(int(ACK_MIN_S * 1000), self._flush)
+
+    @dbus.service.method(GATT_CHRC_IFACE, in_signature="a{sv}", out_signature="ay")
+    def ReadValue(self, options):
+        return _to_dbus_array_of_bytes(self._last)
+
+    def _send(self, pkt: bytes):
+        self._last = pkt
+        if self.notifying:
+            try:
+                self.notify_value(pkt)
+            except Exception as e:
+                print("ACK notify failed:", e)
+
+    def ok(self, seq: int):
+        self._pending_seq = seq
+        if (time.monotonic() - self._last_sent) >= ACK_MIN_S:
+            self._flush()
+
+    def error(self, seq: int, status: int, field_id: int = 0):
+        self._send(proto.encode_ack(proto.K_ERR, seq, status, field_id))
+
+    def _flush(self):
+        seq = self._pending_seq
+        if seq is not None:
+            self._pending_seq = None
+            self._last_sent = time.monotonic()
+            self._send(proto.encode_ack(proto.K_ACK, seq))
+        return True
+
+
+class ParamsCharacteristic(Characteristic):
+    """
+    Parameter schema (firmware/params.py) as JSON grouped by owner:
+    {"global": [...], "ripple": [...], ...}; each entry has name, type,
+    range/options, default and the binary field id. Static, built once.
+    """
+    def __init__(self, bus, index, service):
+        super().__init__(bus, index, PARAMS_UUID, ["read"], service)
+        self._data = schema_json()
 
     @dbus.service.method(GATT_CHRC_IFACE, in_signature="a{sv}", out_signature="ay")
     def ReadValue(self, options):
-        data = json.dumps(SHARED.snapshot()).encode("utf-8")
-        return _to_dbus_array_of_bytes(data)
+        self._note_mtu(options)
+        try:
+            off = int(options.get("offset", 0))
+        except Exception:
+            off = 0
+        return _to_dbus_array_of_bytes(self._data[off:])
+
+
+class SpectrumCharacteristic(Characteristic):
+    """
+    Live spectrum for the app (ctrl_proto.pack_spectrum, 11 bytes/packet).
+    Sent at the "spectrum_hz" rate only while someone is subscribed.
+    """
+    def __init__(self, bus, index, service):
+        super().__init__(bus, index, SPECTRUM_UUID, ["notify"], service)
+        self._seq = 0
+        self._hz = None
+        self._arm()
+
+    def _arm(self):
+        self._hz = int(SHARED.state.get("spectrum_hz", 20))
+        GLib.timeout_add(max(1, int(1000 / self._hz)), self._tick)
+
+    @dbus.service.method(GATT_CHRC_IFACE)
+    def StartNotify(self):
+        SPECTRUM.take()  # bez starej ramki na start
+        self.notifying = True
+
+    def _tick(self):
+        if int(SHARED.state.get("spectrum_hz", 20)) != self._hz:
+            self._arm()
+            return False
+        if not self.notifying:
+            return True
+        item = SPECTRUM.take()
+        if item is None:
+            return True
+        bands, rms, beat = item
+        try:
+            self.notify_value(proto.pack_spectrum(self._seq, bands, rms, beat))
+            self._seq = (self._seq + 1) & 0xFF
+        except Exception as e:
+            print("SPECTRUM notify failed:", e)
+        return True
 
 
 class VisualizerService(Service):
     def __init__(self, bus, index=0):
         super().__init__(bus, index, SVC_UUID, primary=True)
+        self.mtu = DEFAULT_MTU
         self.add_characteristic(CmdCharacteristic(bus, 0, self))
         self.add_characteristic(StateCharacteristic(bus, 1, self))
+        self.ack = AckCharacteristic(bus, 2, self)
+        self.add_characteristic(self.ack)
+        self.add_characteristic(ParamsCharacteristic(bus, 3, self))
+        self.add_characteristic(SpectrumCharacteristic(bus, 4, self))
 
 
 # ===================== SERVER START =====================
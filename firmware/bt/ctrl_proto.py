@@ -0,0 +1,171 @@
+# firmware/bt/ctrl_proto.py
+# Binary control protocol for the CMD characteristic (alongside JSON).
+#
+# Write (client -> Pi):
+#   A5 <ver=1> <seq u16 LE> { <field_id u8> <type u8> <value...> }*
+# One write may carry any number of fields (batched update). Types:
+#   T_BOOL  1 byte (0/1)
+#   T_U8    1 byte
+#   T_UQ16  u16 LE, value = raw / 1000   (0.000 .. 65.535; sliders, gain)
+#   T_F32   f32 LE
+#   T_STR   <len u8> <utf-8 bytes>
+#
+# Ack/error (Pi -> client, ACK characteristic notify/read):
+#   A5 <ver=1> <kind> <seq u16 LE> <status u8> <field_id u8>
+# kind: K_ACK (write applied) / K_ERR. OK acks may be coalesced (only the
+# newest seq is reported), errors are always sent. JSON writes have no seq,
+# their errors are reported with seq 0.
+#
+# JSON writes are told apart by the first byte: a JSON object never starts
+# with 0xA5.
+#
+# Spectrum (Pi -> client, SPECTRUM characteristic notify), 11 bytes:
+#   <seq u8> <16 bands x 4 bit, band 0 in the high nibble of byte 1>
+#   <rms u8 = min(1, rms*4) * 255> <flags u8: bit0 = beat since last packet>
+# Rate: "spectrum_hz" parameter (10..30), set like any other field.
+
+import struct
+
+from firmware import params
+
+MAGIC = 0xA5
+VERSION = 1
+
+T_BOOL = 0x00
+T_U8 = 0x01
+T_UQ16 = 0x02
+T_F32 = 0x03
+T_STR = 0x04
+
+K_ACK = 0x80
+K_ERR = 0x81
+
+ST_OK = 0
+ST_BAD_VERSION = 1
+ST_MALFORMED = 2
+ST_UNKNOWN_FIELD = 3
+ST_BAD_VALUE = 4
+
+# id pól z rejestru parametrów (Param.fid), także parametry efektów
+FIELDS = {fid: p.name for fid, p in params.BY_FID.items()}
+FIELD_IDS = {v: k for k, v in FIELDS.items()}
+
+_HDR = struct.Struct("<BBH")
+_ACK = struct.Struct("<BBBHBB")
+_U16 = struct.Struct("<H")
+_F32 = struct.Struct("<f")
+
+
+class ProtoError(Exception):
+    def __init__(self, status: int, seq: int = 0, field_id: int = 0):
+        super().__init__(status)
+        self.status = status
+        self.seq = seq
+        self.field_id = field_id
+
+
+def is_binary(b: bytes) -> bool:
+    return len(b) > 0 and b[0] == MAGIC
+
+
+def decode(b: bytes):
+    """
+    -> (seq, patch, unknown_field_ids). Raises ProtoError on a malformed or
+    unsupported write; in that case nothing from the write may be applied.
+    Unknown field ids are skipped (their length is known from the type).
+    """
+    if len(b) < _HDR.size:
+        raise ProtoError(ST_MALFORMED)
+    magic, ver, seq = _HDR.unpack_from(b, 0)
+    if magic != MAGIC:
+        raise ProtoError(ST_MALFORMED)
+    if ver != VERSION:
+        raise ProtoError(ST_BAD_VERSION, seq)
+
+    patch = {}
+    unknown = []
+    i = _HDR.size
+    n = len(b)
+    while i < n:
+        if i + 2 > n:
+            raise ProtoError(ST_MALFORMED, seq)
+        fid, typ = b[i], b[i + 1]
+        i += 2
+        if typ in (T_BOOL, T_U8):
+            if i + 1 > n:
+                raise ProtoError(ST_MALFORMED, seq, fid)
+            v = bool(b[i]) if typ == T_BOOL else int(b[i])
+            i += 1
+        elif typ == T_UQ16:
+            if i + 2 > n:
+                raise ProtoError(ST_MALFORMED, seq, fid)
+            v = _U16.unpack_from(b, i)[0] / 1000.0
+            i += 2
+        elif typ == T_F32:
+            if i + 4 > n:
+                raise ProtoError(ST_MALFORMED, seq, fid)
+            v = _F32.unpack_from(b, i)[0]
+            i += 4
+            if v != v or v in (float("inf"), float("-inf")):
+                raise ProtoError(ST_BAD_VALUE, seq, fid)
+        elif typ == T_STR:
+            if i + 1 > n:
+                raise ProtoError(ST_MALFORMED, seq, fid)
+            ln = b[i]
+            i += 1
+            if i + ln > n:
+                raise ProtoError(ST_MALFORMED, seq, fid)
+            try:
+                v = bytes(b[i : i + ln]).decode("utf-8")
+            except UnicodeDecodeError:
+                raise ProtoError(ST_BAD_VALUE, seq, fid)
+            i += ln
+        else:
+            raise ProtoError(ST_MALFORMED, seq, fid)
+
+        name = FIELDS.get(fid)
+        if name is None:
+            unknown.append(fid)
+        else:
+            patch[name] = v
+    return seq, patch, unknown
+
+
+def encode(seq: int, patch: dict) -> bytes:
+    """Client side encoder (tools/tests); floats go as UQ16 when they fit."""
+    out = bytearray(_HDR.pack(MAGIC, VERSION, seq & 0xFFFF))
+    for name, v in patch.items():
+        fid = FIELD_IDS[name]
+        if isinstance(v, bool):
+            out += bytes((fid, T_BOOL, 1 if v else 0))
+        elif isinstance(v, int) and 0 <= v <= 255:
+            out += bytes((fid, T_U8, v))
+        elif isinstance(v, (int, float)) and 0.0 <= v <= 65.535:
+            out += bytes((fid, T_UQ16)) + _U16.pack(int(round(v * 1000.0)))
+        elif isinstance(v, (int, float)):
+            out += bytes((fid, T_F32)) + _F32.pack(float(v))
+        else:
+            s = str(v).encode("utf-8")[:255].decode("utf-8", "ignore").encode("utf-8")
+            out += bytes((fid, T_STR, len(s))) + s
+    return bytes(out)
+
+
+def encode_ack(kind: int, seq: int, status: int = ST_OK, field_id: int = 0) -> bytes:
+    return _ACK.pack(MAGIC, VERSION, kind, seq & 0xFFFF, status & 0xFF, field_id & 0xFF)
+
+
+SPECTRUM_BANDS = 16
+FLAG_BEAT = 0x01
+
+
+def pack_spectrum(seq: int, bands, rms: float, beat: bool) -> bytes:
+    out = bytearray(3 + SPECTRUM_BANDS // 2)
+    out[0] = seq & 0xFF
+    q = [min(15, max(0, int(float(v) * 15.0 + 0.5))) for v in bands[:SPECTRUM_BANDS]]
+    q += [0] * (SPECTRUM_BANDS - len(q))
+    for i in range(0, SPECTRUM_BANDS, 2):
+        out[1 + i // 2] = (q[i] << 4) | q[i + 1]
+    r = float(rms) * 4.0
+    out[-2] = 255 if r >= 1.0 else max(0, int(r * 255.0))
+    out[-1] = FLAG_BEAT if beat else 0
+    return bytes(out)
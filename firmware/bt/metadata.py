@@ -1,4 +1,5 @@
 import asyncio
+import time
 from dbus_next.aio import MessageBus
 from dbus_next.constants import BusType
 
@@ -8,14 +9,32 @@ PROP_IFACE = "org.freedesktop.DBus.Properties"
 OBJMGR_IFACE = "org.freedesktop.DBus.ObjectManager"
 
 class BtMetadata:
+    """
+    AVRCP metadata from BlueZ MediaPlayer1 over one long-lived system bus
+    connection. Players appearing/disappearing are followed through
+    ObjectManager InterfacesAdded/InterfacesRemoved; the properties handler is
+    only re-bound when the player path actually changes.
+
+    Status/Position: AVRCP only reports position on seeks, track and status
+    changes, so between updates it is interpolated from a monotonic clock
+    instead of polling Position.
+    """
     def __init__(self):
         self.track = {"Title": "", "Artist": "", "Album": "", "Duration": 0, "AlbumArtURL": ""}
         self.connected = False
+        self.status = "stopped"
+        # (pozycja_ms, monotonic w chwili odczytu, czy gra) - podmieniane w całości
+        self._pos = (0, time.monotonic(), False)
         self._bus = None
+        self._mgr = None
         self._props = None
         self._player_path = None
 
     async def start(self):
+        """Connect (once) and bind to the current player, if there is one."""
+        if self._bus is not None and self._bus.connected:
+            return self
+
         self.connected = False
         self._props = None
         self._player_path = None
@@ -24,33 +43,83 @@ class BtMetadata:
 
         intro = await self._bus.introspect(BLUEZ, "/")
         root_obj = self._bus.get_proxy_object(BLUEZ, "/", intro)
-        mgr = root_obj.get_interface(OBJMGR_IFACE)
+        self._mgr = root_obj.get_interface(OBJMGR_IFACE)
+        self._mgr.on_interfaces_added(self._on_ifaces_added)
+        self._mgr.on_interfaces_removed(self._on_ifaces_removed)
+
+        await self._rescan()
+        return self
 
-        managed = await mgr.call_get_managed_objects()
+    async def wait_closed(self):
+        if self._bus is not None:
+            await self._bus.wait_for_disconnect()
 
-        for path, ifaces in managed.items():
+    def close(self):
+        self._unbind()
+        bus, self._bus = self._bus, None
+        self._mgr = None
+        if bus is not None:
+            try:
+                bus.disconnect()
+            except Exception:
+                pass
+
+    async def _rescan(self):
+        managed = await self._mgr.call_get_managed_objects()
+        path = None
+        for p, ifaces in managed.items():
             if MP_IFACE in ifaces:
-                self._player_path = path
+                path = p
                 break
+        if path is None:
+            self._unbind()
+        else:
+            await self._bind(path)
 
-        if self._player_path is None:
-            return self
+    async def _bind(self, path):
+        if path == self._player_path and self._props is not None:
+            return
+        self._unbind()
+        self._player_path = path
 
-        p_intro = await self._bus.introspect(BLUEZ, self._player_path)
-        p_obj = self._bus.get_proxy_object(BLUEZ, self._player_path, p_intro)
-        self._props = p_obj.get_interface(PROP_IFACE)
+        p_intro = await self._bus.introspect(BLUEZ, path)
+        p_obj = self._bus.get_proxy_object(BLUEZ, path, p_intro)
+        props = p_obj.get_interface(PROP_IFACE)
 
         try:
             # GetAll jest stabilniejsze niż Get("Track") na niektórych telefonach
-            allp = await self._props.call_get_all(MP_IFACE)
+            allp = await props.call_get_all(MP_IFACE)
             if "Track" in allp:
                 self._apply_track(allp["Track"].value)
+            self._apply_playback(allp)
             self.connected = True
         except Exception:
             self.connected = False
 
-        self._props.on_properties_changed(self._on_props_changed)
-        return self
+        props.on_properties_changed(self._on_props_changed)
+        self._props = props
+
+    def _unbind(self):
+        props, self._props = self._props, None
+        if props is not None:
+            try:
+                props.off_properties_changed(self._on_props_changed)
+            except Exception:
+                pass
+        self._player_path = None
+        self.connected = False
+        self.status = "stopped"
+        self._pos = (0, time.monotonic(), False)
+
+    def _on_ifaces_added(self, path, ifaces):
+        if MP_IFACE in ifaces and path != self._player_path:
+            asyncio.ensure_future(self._bind(path))
+
+    def _on_ifaces_removed(self, path, ifaces):
+        if MP_IFACE in ifaces and path == self._player_path:
+            self._unbind()
+            # może jest jeszcze inny odtwarzacz (drugi telefon)
+            asyncio.ensure_future(self._rescan())
 
     def _norm_artist(self, a):
         if a is None:
@@ -79,13 +148,48 @@ class BtMetadata:
         if "AlbumArtURL" in d:
             self.track["AlbumArtURL"] = str(val(d["AlbumArtURL"]) or "")
 
+    def _position_now(self) -> int:
+        pos, t, playing = self._pos
+        if playing:
+            pos += int((time.monotonic() - t) * 1000.0)
+        dur = int(self.track.get("Duration", 0) or 0)
+        if dur > 0:
+            pos = min(pos, dur)
+        return max(0, pos)
+
+    def _apply_playback(self, d):
+        status = self.status
+        if "Status" in d:
+            status = str(d["Status"].value or "stopped").lower()
+        playing = status == "playing"
+
+        if "Position" in d:
+            try:
+                pos = int(d["Position"].value)
+            except Exception:
+                pos = self._position_now()
+        else:
+            # sama zmiana statusu: zamroź/odmroź dotychczasową interpolację
+            pos = self._position_now()
+
+        self.status = status
+        self._pos = (pos, time.monotonic(), playing)
+
     def _on_props_changed(self, iface_name, changed, invalidated):
         if iface_name != MP_IFACE:
             return
         if "Track" in changed:
             try:
+                old_title = self.track.get("Title", "")
                 self._apply_track(changed["Track"].value)
                 self.connected = True
+                if self.track.get("Title", "") != old_title and "Position" not in changed:
+                    self._pos = (0, time.monotonic(), self._pos[2])
+            except Exception:
+                pass
+        if "Status" in changed or "Position" in changed:
+            try:
+                self._apply_playback(changed)
             except Exception:
                 pass
 
@@ -97,12 +201,21 @@ class BtMetadata:
             "album": self.track.get("Album", "") or "",
             "duration_ms": int(self.track.get("Duration", 0) or 0),
             "cover_url": self.track.get("AlbumArtURL", "") or "",
+            "status": self.status,
+            "is_playing": bool(self._pos[2]),
+            "position_ms": self._position_now(),
         }
 
 async def bt_metadata_loop(meta: BtMetadata):
+    # jedno połączenie; ponowne tylko gdy bus się rozłączy (z backoffem)
+    backoff = 1.0
     while True:
         try:
             await meta.start()
+            backoff = 1.0
+            await meta.wait_closed()
         except Exception:
-            meta.connected = False
-        await asyncio.sleep(2.0)
+            pass
+        meta.close()
+        await asyncio.sleep(backoff)
+        backoff = min(30.0, backoff * 2.0)
@@ -0,0 +1,203 @@
+# firmware/bt/shared_state.py
+# Control state shared by the render loop and the control server (BlueZ GATT
+# or the local socket stand-in): SHARED parameters, SPECTRUM feed and the
+# CMD write handling, with no dbus/GLib dependency.
+
+import json
+import threading
+
+from firmware import params
+from firmware.bt import ctrl_proto as proto
+
+
+class Subscription:
+    """
+    Change feed over SharedState. poll() returns only the fields changed since
+    the previous poll ({} when nothing changed; that check takes no lock).
+    """
+    def __init__(self, shared, keys=None):
+        self.shared = shared
+        self.keys = None if keys is None else frozenset(keys)
+        self.seen = -1
+
+    def pending(self) -> bool:
+        return self.shared.version != self.seen
+
+    def poll(self) -> dict:
+        if self.shared.version == self.seen:
+            return {}
+        sh = self.shared
+        with sh.lock:
+            out = {
+                k: sh.state[k]
+                for k, kv in sh._key_version.items()
+                if kv > self.seen and (self.keys is None or k in self.keys)
+            }
+            self.seen = sh.version
+        return out
+
+    def wait(self, timeout=None) -> bool:
+        """Block until something changed since the last poll()."""
+        with self.shared._cond:
+            return self.shared._cond.wait_for(self.pending, timeout)
+
+
+class SharedState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._cond = threading.Condition(self.lock)
+        # wartości domyślne i walidacja: firmware/params.py
+        self.state = params.defaults()
+        # version rośnie przy każdej zmianie; _key_version[k] = version ostatniej zmiany k
+        self.version = 0
+        self._key_version = {k: 0 for k in self.state}
+
+    def _apply(self, patch: dict, device: bool) -> list:
+        rejected = []
+        with self.lock:
+            changed = []
+            for k, v in patch.items():
+                if k not in self.state or ((k in params.DEVICE_KEYS) != device):
+                    rejected.append(k)
+                    continue
+                try:
+                    v = params.validate(k, v)
+                except Exception:
+                    rejected.append(k)
+                    continue
+                if self.state[k] != v:
+                    self.state[k] = v
+                    changed.append(k)
+            if changed:
+                self.version += 1
+                for k in changed:
+                    self._key_version[k] = self.version
+                self._cond.notify_all()
+        return rejected
+
+    def update(self, patch: dict) -> list:
+        """Patch from the BLE client. Returns keys that were unknown or invalid."""
+        return self._apply(patch, device=False)
+
+    def publish(self, patch: dict):
+        """Device-side values (features, AVRCP metadata) for notify subscribers."""
+        self._apply(patch, device=True)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.state)
+
+    def subscribe(self, keys=None) -> Subscription:
+        return Subscription(self, keys)
+
+
+SHARED = SharedState()
+
+
+class SpectrumFeed:
+    """
+    Latest analysis frame for the SPECTRUM characteristic. push() overwrites
+    (drop-oldest, the BLE side only ever wants the newest bands); the beat
+    flag is sticky until take(), so a beat between two packets is not lost.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._bands = None
+        self._rms = 0.0
+        self._beat = False
+        self._fresh = False
+
+    def push(self, bands, rms: float, beat: bool):
+        b = [float(v) for v in bands]
+        with self.lock:
+            self._bands = b
+            self._rms = float(rms)
+            self._beat = self._beat or bool(beat)
+            self._fresh = True
+
+    def take(self):
+        with self.lock:
+            if not self._fresh:
+                return None
+            out = (self._bands, self._rms, self._beat)
+            self._fresh = False
+            self._beat = False
+            return out
+
+
+SPECTRUM = SpectrumFeed()
+
+
+def json_bytes(d: dict) -> bytes:
+    return json.dumps(d, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def pack_delta(delta: dict, limit: int) -> list:
+    """
+    Split a {field: value} delta into JSON objects of at most `limit` bytes.
+    A single string field that is too long on its own gets truncated.
+    """
+    packets = []
+    cur = {}
+    for k, v in delta.items():
+        cand = dict(cur)
+        cand[k] = v
+        if len(json_bytes(cand)) <= limit:
+            cur = cand
+            continue
+        if cur:
+            packets.append(json_bytes(cur))
+            cur = {}
+        if len(json_bytes({k: v})) > limit:
+            if not isinstance(v, str):
+                continue
+            while v and len(json_bytes({k: v})) > limit:
+                v = v[:-1]
+        cur = {k: v}
+    if cur:
+        packets.append(json_bytes(cur))
+    return packets
+
+
+def handle_cmd(b: bytes, ack):
+    """
+    One CMD write: a UTF-8 JSON patch or a binary TLV write (see ctrl_proto).
+    Results go to ack.ok(seq) / ack.error(seq, status, field_id).
+    """
+    if proto.is_binary(b):
+        try:
+            seq, patch, unknown = proto.decode(b)
+        except proto.ProtoError as e:
+            ack.error(e.seq, e.status, e.field_id)
+            return
+        rejected = SHARED.update(patch) if patch else []
+        if unknown:
+            ack.error(seq, proto.ST_UNKNOWN_FIELD, unknown[0])
+        elif rejected:
+            ack.error(seq, proto.ST_BAD_VALUE, proto.FIELD_IDS.get(rejected[0], 0))
+        else:
+            ack.ok(seq)
+        return
+
+    try:
+        patch = json.loads(b.decode("utf-8"))
+    except Exception:
+        ack.error(0, proto.ST_MALFORMED)
+        return
+    if not isinstance(patch, dict):
+        ack.error(0, proto.ST_MALFORMED)
+        return
+    # poprawne pola i tak wchodzą (JSON nie jest atomowy); pierwszy odrzucony idzie w ACK
+    rejected = SHARED.update(patch)
+    if rejected:
+        k = rejected[0]
+        status = proto.ST_BAD_VALUE if k in params.CLIENT_KEYS else proto.ST_UNKNOWN_FIELD
+        ack.error(0, status, proto.FIELD_IDS.get(k, 0))
+
+
+def schema_json() -> bytes:
+    """Parameter schema grouped by owner: {"global": [...], "ripple": [...], ...}."""
+    groups = {}
+    for d in params.schema():
+        groups.setdefault(d.get("fx", "global"), []).append(d)
+    return json_bytes(groups)
@@ -0,0 +1,21 @@
+from firmware.effects.bars import BarsEffect
+from firmware.effects.oscilloscope import OscilloscopeEffect
+from firmware.effects.radial_pulse import RadialPulseEffect
+from firmware.effects.spectral_fire import SpectralFireEffect
+from firmware.effects.plasma import PlasmaEffect
+from firmware.effects.spiral import SpiralEffect
+from firmware.effects.ripple import RippleEffect
+from firmware.effects.kaleidoscope import KaleidoscopeEffect
+
+
+def make_effects(w=16, h=16):
+    return {
+        "bars": BarsEffect(w=w, h=h),
+        "osc": OscilloscopeEffect(w=w, h=h),
+        "pulse": RadialPulseEffect(w=w, h=h),
+        "fire": SpectralFireEffect(w=w, h=h),
+        "plasma": PlasmaEffect(w=w, h=h),
+        "spiral": SpiralEffect(w=w, h=h),
+        "ripple": RippleEffect(w=w, h=h),
+        "kaleidoscope": KaleidoscopeEffect(w=w, h=h),
+    }
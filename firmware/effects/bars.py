@@ -1,6 +1,7 @@
 import numpy as np
 import colorsys
 from firmware.effects.common import safe_bands, safe_rms, blank_frame
+from firmware.params import as_params
 
 class BarsEffect:
     def __init__(self, w=16, h=16):
@@ -35,8 +36,8 @@ class BarsEffect:
     def update(self, features, dt, params=None):
         try:
             dt = float(dt) if dt else 0.02
-            p = (params or {})
-            intensity = float(p.get("intensity", 0.75))
+            p = as_params(params)
+            intensity = p.intensity
 
             bands = safe_bands(features, self.w)
             rms = safe_rms(features)
@@ -54,7 +55,7 @@ class BarsEffect:
             bands = bands[self.map_idx]
 
             # gauss: środek wyżej, boki niżej (krzywa dzwonowa)
-            gauss_strength = float(p.get("bars_gauss", 0.55))  # 0..1
+            gauss_strength = p.bars_gauss  # 0..1
             shape = (1.0 - gauss_strength) + gauss_strength * self.gauss
             bands = np.clip(bands * shape, 0.0, 1.0)
 
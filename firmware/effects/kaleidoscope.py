@@ -1,6 +1,7 @@
 import numpy as np
 import colorsys
 from firmware.effects.common import safe_bands, safe_rms, blank_frame
+from firmware.params import as_params
 
 class KaleidoscopeEffect:
     """
@@ -22,7 +23,7 @@ class KaleidoscopeEffect:
             mid = float(np.mean(bands[4:12]))
             treble = float(np.mean(bands[12:]))
             
-            intensity = float((params or {}).get("intensity", 0.75))
+            intensity = as_params(params).intensity
             
             # Szybsza rotacja na bass
             self.t += dt * (0.8 + 3.5 * bass)
@@ -1,6 +1,7 @@
 import numpy as np
 import colorsys
 from firmware.effects.common import safe_bands, safe_rms, blank_frame
+from firmware.params import as_params
 
 class OscilloscopeEffect:
     def __init__(self, w=16, h=16):
@@ -18,7 +19,7 @@ class OscilloscopeEffect:
             bands = safe_bands(features, self.w)
             energy = float(np.mean(bands))
 
-            intensity = float((params or {}).get("intensity", 0.75))
+            intensity = as_params(params).intensity
 
             amp = (self.h/2 - 1) * min(1.0, rms * 10.0) * (0.5 + intensity)
             mid = (self.h - 1) / 2.0
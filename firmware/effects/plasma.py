@@ -1,6 +1,7 @@
 import numpy as np
 import colorsys
 from firmware.effects.common import safe_bands, safe_rms, blank_frame
+from firmware.params import as_params
 
 class PlasmaEffect:
     """
@@ -22,7 +23,7 @@ class PlasmaEffect:
             bass = float(np.mean(bands[:4]))
             mid = float(np.mean(bands[4:12]))
             
-            intensity = float((params or {}).get("intensity", 0.75))
+            intensity = as_params(params).intensity
             
             # Speed controlled by bass (szybciej)
             speed = 1.2 + 5.0 * bass * intensity
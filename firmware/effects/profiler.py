@@ -0,0 +1,153 @@
+# firmware/effects/profiler.py
+# Render-time profiling and frame-budget enforcement for effects.
+#
+# EffectProfiler.update() times every effect.update() (per effect and matrix
+# size), keeps a window of the last samples for percentiles and counts frames
+# over budget. With auto_degrade an effect whose p95 stays over budget is
+# stepped down:
+#   level 1  render every other tick (the previous frame is repeated, dt adds up)
+#   level 2  also render at half resolution and upscale (nearest neighbour)
+# and stepped back up once it is comfortably under budget again.
+
+import time
+
+import numpy as np
+
+from firmware.effects.common import blank_frame
+
+WINDOW = 40          # próbek między decyzjami o degradacji
+MAX_LEVEL = 2
+
+
+class _Stats:
+    __slots__ = ("ms", "n", "over", "frames", "level", "since", "skip", "dt_acc", "last", "low", "up")
+
+    def __init__(self, size):
+        self.ms = np.zeros(size, dtype=np.float32)
+        self.n = 0            # wszystkie próbki (indeks w ringu = n % size)
+        self.over = 0         # renderów ponad budżet
+        self.frames = 0       # ticków (z pominiętymi)
+        self.level = 0
+        self.since = 0        # próbek od ostatniej zmiany poziomu
+        self.skip = False
+        self.dt_acc = 0.0
+        self.last = None
+        self.low = None       # instancja efektu w połowie rozdzielczości (poziom 2)
+        self.up = None        # indeksy upscalingu low -> pełna matryca
+
+    def window(self, k):
+        n = min(self.n, self.ms.shape[0], k)
+        if n <= 0:
+            return self.ms[:0]
+        i = self.n % self.ms.shape[0]
+        idx = (np.arange(i - n, i)) % self.ms.shape[0]
+        return self.ms[idx]
+
+
+class EffectProfiler:
+    def __init__(self, budget_s: float, size: int = 256, auto_degrade: bool = True):
+        self.budget_ms = float(budget_s) * 1000.0
+        self.size = int(size)
+        self.auto_degrade = bool(auto_degrade)
+        self._stats: dict = {}
+
+    @staticmethod
+    def key(name: str, effect) -> str:
+        return f"{name}@{getattr(effect, 'w', '?')}x{getattr(effect, 'h', '?')}"
+
+    def _render(self, effect, feats, dt, params):
+        try:
+            return effect.update(feats, dt, params)
+        except TypeError:
+            return effect.update(feats, dt)
+
+    def _low(self, st: _Stats, effect):
+        if st.low is None:
+            w, h = effect.w, effect.h
+            lw, lh = max(1, w // 2), max(1, h // 2)
+            st.low = type(effect)(w=lw, h=lh)
+            ys = np.minimum(np.arange(h) * lh // h, lh - 1)
+            xs = np.minimum(np.arange(w) * lw // w, lw - 1)
+            st.up = (ys[:, None] * lw + xs[None, :]).ravel().tolist()
+        return st.low
+
+    def _adjust(self, k: str, st: _Stats, effect):
+        # koszt na tick: poziom 1+ renderuje co drugi tick; poziom 2 mierzy render w niskiej rozdzielczości
+        p95 = float(np.percentile(st.window(WINDOW), 95))
+        per_tick = p95 if st.level == 0 else p95 / 2.0
+        if st.level == 0:
+            back = None
+        elif st.level == 1:
+            back = p95
+        else:
+            back = p95 * (effect.w * effect.h) / float(st.low.w * st.low.h) / 2.0
+
+        if per_tick > self.budget_ms and st.level < MAX_LEVEL:
+            st.level += 1
+        elif back is not None and back < self.budget_ms * 0.8:
+            st.level -= 1
+        else:
+            return
+        st.since = 0
+        print(f"[FX] {k} p95={p95:.1f}ms budget={self.budget_ms:.1f}ms -> degrade level {st.level}")
+
+    def update(self, name: str, effect, feats, dt, params):
+        """effect.update() with timing (and degradation); exceptions propagate."""
+        k = self.key(name, effect)
+        st = self._stats.get(k)
+        if st is None:
+            st = self._stats[k] = _Stats(self.size)
+        st.frames += 1
+
+        level = st.level if self.auto_degrade else 0
+        if level >= 1:
+            st.dt_acc += dt
+            st.skip = not st.skip
+            if st.skip and st.last is not None:
+                return st.last
+            dt, st.dt_acc = st.dt_acc, 0.0
+
+        t0 = time.perf_counter()
+        if level >= 2:
+            low = self._low(st, effect)
+            small = self._render(low, feats, dt, params)
+            if small is not None and len(small) == low.w * low.h:
+                frame = [small[i] for i in st.up]
+            else:
+                frame = blank_frame(effect.w, effect.h)
+        else:
+            frame = self._render(effect, feats, dt, params)
+        ms = (time.perf_counter() - t0) * 1000.0
+
+        st.ms[st.n % self.size] = ms
+        st.n += 1
+        st.since += 1
+        if ms > self.budget_ms:
+            st.over += 1
+        st.last = frame
+
+        if self.auto_degrade and st.since >= WINDOW:
+            self._adjust(k, st, effect)
+        return frame
+
+    def report(self) -> dict:
+        """key -> {p50, p95, p99, max (ms), over (fraction), level}."""
+        out = {}
+        for k, st in self._stats.items():
+            w = st.window(self.size)
+            if w.shape[0] == 0:
+                continue
+            p = np.percentile(w, (50, 95, 99))
+            out[k] = {
+                "p50": float(p[0]),
+                "p95": float(p[1]),
+                "p99": float(p[2]),
+                "max": float(w.max()),
+                "over": st.over / max(1, st.n),
+                "level": st.level,
+            }
+        return out
+
+    def flagged(self) -> list:
+        """Effects over the frame budget (p95) or currently degraded."""
+        return [k for k, r in self.report().items() if r["p95"] > self.budget_ms or r["level"] > 0]
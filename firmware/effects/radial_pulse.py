@@ -1,6 +1,7 @@
 import numpy as np
 from firmware.effects.palette import color_for
 from firmware.effects.common import safe_bands, blank_frame
+from firmware.params import as_params
 
 class RadialPulseEffect:
     def __init__(self, w=16, h=16):
@@ -13,7 +14,7 @@ class RadialPulseEffect:
             dt = float(dt) if dt else 0.02
             self.t += dt
 
-            intensity = float((params or {}).get("intensity", 0.75))
+            intensity = as_params(params).intensity
             bands = safe_bands(features, self.w)
 
             bass = float(np.mean(bands[:4]))
@@ -1,6 +1,7 @@
 import numpy as np
 import colorsys
 from firmware.effects.common import safe_bands, safe_rms, blank_frame
+from firmware.params import as_params
 
 class RippleEffect:
     def __init__(self, w=16, h=16):
@@ -24,14 +25,14 @@ class RippleEffect:
             bass = float(np.mean(bands[:4]))
             mid = float(np.mean(bands[4:12]))
 
-            p = (params or {})
-            intensity = float(p.get("intensity", 0.75))
+            p = as_params(params)
+            intensity = p.intensity
 
             # more frequent ripples
-            cooldown = float(p.get("ripple_cooldown", 0.10))
-            min_bass = float(p.get("ripple_min_bass", 0.18))
-            delta = float(p.get("ripple_delta", 0.06))
-            beat_th = float(p.get("ripple_beat_th", 0.28))
+            cooldown = p.ripple_cooldown
+            min_bass = p.ripple_min_bass
+            delta = p.ripple_delta
+            beat_th = p.ripple_beat_th
 
             self.last_bass = 0.65 * self.last_bass + 0.35 * bass
             beat = bass + 0.35 * mid
@@ -41,15 +42,15 @@ class RippleEffect:
                     self.ripples.append((self.t, beat))
                     self.last_trigger_t = self.t
 
-            ttl = float(p.get("ripple_ttl", 2.2))
+            ttl = p.ripple_ttl
             self.ripples = [(t, s) for (t, s) in self.ripples if self.t - t < ttl]
 
             frame = blank_frame(self.w, self.h)
             cx, cy = (self.w - 1) / 2.0, (self.h - 1) / 2.0
 
-            speed = float(p.get("ripple_speed", 10.5))
-            ring_w = float(p.get("ripple_width", 2.3))
-            gauss = float(p.get("ripple_gauss", 0.55))
+            speed = p.ripple_speed
+            ring_w = p.ripple_width
+            gauss = p.ripple_gauss
 
             for y in range(self.h):
                 for x in range(self.w):
@@ -1,6 +1,7 @@
 import numpy as np
 from firmware.effects.palette import color_for
 from firmware.effects.common import safe_bands, blank_frame
+from firmware.params import as_params
 
 class SpectralFireEffect:
     """
@@ -19,7 +20,7 @@ class SpectralFireEffect:
             self.t += dt
             
             bands = safe_bands(features, self.w)
-            intensity = float((params or {}).get("intensity", 0.75))
+            intensity = as_params(params).intensity
             
             # Scroll field up (fire rises)
             self.field[1:] = self.field[:-1]
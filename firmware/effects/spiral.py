@@ -1,6 +1,7 @@
 import numpy as np
 import colorsys
 from firmware.effects.common import safe_bands, safe_rms, blank_frame
+from firmware.params import as_params
 
 class SpiralEffect:
     """
@@ -21,7 +22,7 @@ class SpiralEffect:
             mid  = float(np.mean(bands[4:12]))
             treble = float(np.mean(bands[12:]))
 
-            intensity = float((params or {}).get("intensity", 0.75))
+            intensity = as_params(params).intensity
 
             # mocniejsza rotacja
             rotation_speed = 1.5 + 7.0 * bass * intensity + 2.5 * mid
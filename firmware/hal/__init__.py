@@ -0,0 +1,110 @@
+# firmware/hal/__init__.py
+# Hardware backends, chosen by environment variables so the same main.py runs
+# on the Pi and on any Linux box (development, profiling, load tests):
+#
+#   VIS_LED_BACKEND    serial (default) | pty | mem
+#   VIS_LCD_BACKEND    spi (default)    | png | null
+#   VIS_AUDIO_BACKEND  sounddevice (default) | wav | synth
+#   VIS_BLE_BACKEND    bluez (default)  | socket | off
+#
+# VIS_HAL=sim makes the simulated one the default everywhere (mem, null,
+# synth, socket); a per-device variable still wins. Backend options:
+#   VIS_LCD_PNG     png file for the png backend (/tmp/visualizer-lcd.png)
+#   VIS_AUDIO_WAV   16-bit PCM WAV for the wav backend (looped)
+#   VIS_BLE_SOCKET  unix socket path for the socket backend (/tmp/visualizer-ble.sock)
+#
+# Hardware libraries (serial, spidev, lgpio, sounddevice, dbus) are imported
+# only by the backend that needs them.
+
+import os
+
+BACKENDS = {
+    "led": (("serial", "pty", "mem"), "mem"),
+    "lcd": (("spi", "png", "null"), "null"),
+    "audio": (("sounddevice", "wav", "synth"), "synth"),
+    "ble": (("bluez", "socket", "off"), "socket"),
+}
+
+LCD_PNG = "/tmp/visualizer-lcd.png"
+BLE_SOCKET = "/tmp/visualizer-ble.sock"
+
+
+def backend(kind: str) -> str:
+    """Configured backend of one device kind ("led", "lcd", "audio", "ble")."""
+    names, sim = BACKENDS[kind]
+    v = os.environ.get(f"VIS_{kind.upper()}_BACKEND")
+    if not v:
+        v = sim if os.environ.get("VIS_HAL", "").lower() == "sim" else names[0]
+    v = v.lower()
+    if v not in names:
+        raise ValueError(f"VIS_{kind.upper()}_BACKEND={v!r}, expected one of {', '.join(names)}")
+    return v
+
+
+def simulated(kind: str) -> bool:
+    return backend(kind) != BACKENDS[kind][0][0]
+
+
+def open_serial(port: str, baud: int, name: str | None = None):
+    """Byte link to the ESP32: write(), out_waiting, close() like pyserial.Serial."""
+    name = name or backend("led")
+    if name == "pty":
+        from firmware.hal.serial_link import PtyLink
+        return PtyLink()
+    if name == "mem":
+        from firmware.hal.serial_link import MemoryLink
+        return MemoryLink(baud=baud)
+
+    import time
+    import serial
+    ser = serial.Serial(port, baud, timeout=0, write_timeout=1)
+    # mała pauza po otwarciu, czasem pomaga na CH340
+    time.sleep(0.08)
+    return ser
+
+
+def open_lcd_bus(*, spi_bus: int, spi_dev: int, spi_hz: int, dc: int, rst: int, cs: int | None,
+                 size: tuple, rotate: int = 0, mirror: bool = False, name: str | None = None):
+    """Panel bus: gpio_write(pin, level), spi_write(data), close()."""
+    name = name or backend("lcd")
+    from firmware.hal import lcd_bus
+    if name == "png":
+        return lcd_bus.PngBus(os.environ.get("VIS_LCD_PNG") or LCD_PNG, size=size, dc=dc,
+                              rotate=rotate, mirror=mirror)
+    if name == "null":
+        return lcd_bus.NullBus()
+    return lcd_bus.SpiGpioBus(spi_bus=spi_bus, spi_dev=spi_dev, spi_hz=spi_hz, dc=dc, rst=rst, cs=cs)
+
+
+def open_audio_input(*, samplerate: int, channels: int, blocksize: int, callback, name: str | None = None):
+    """
+    Capture stream with start()/stop()/close(); callback(indata, frames,
+    time_info, status) as in sounddevice, indata float32 (frames, channels).
+    """
+    name = name or backend("audio")
+    if name == "wav":
+        from firmware.hal.audio_in import WavInput
+        path = os.environ.get("VIS_AUDIO_WAV")
+        if not path:
+            raise ValueError("VIS_AUDIO_BACKEND=wav needs VIS_AUDIO_WAV=<file.wav>")
+        return WavInput(path, samplerate=samplerate, channels=channels, blocksize=blocksize, callback=callback)
+    if name == "synth":
+        from firmware.hal.audio_in import SynthInput
+        return SynthInput(samplerate=samplerate, channels=channels, blocksize=blocksize, callback=callback)
+
+    import sounddevice as sd
+    return sd.InputStream(samplerate=samplerate, channels=channels, blocksize=blocksize,
+                          dtype="float32", callback=callback)
+
+
+def start_ble(name: str | None = None):
+    """Runs the control server (blocks; call from a thread)."""
+    name = name or backend("ble")
+    if name == "off":
+        return
+    if name == "socket":
+        from firmware.hal.ble_socket import serve
+        serve(os.environ.get("VIS_BLE_SOCKET") or BLE_SOCKET)
+        return
+    from firmware.bt.ble_gatt_server import start_ble as start_bluez
+    start_bluez()
@@ -0,0 +1,129 @@
+# firmware/hal/audio_in.py
+# Capture streams without a sound card: WAV file or generated signal, paced in
+# real time and delivered through the same callback as sounddevice.InputStream.
+
+import threading
+import time
+import wave
+
+import numpy as np
+
+
+def synth(t: np.ndarray) -> np.ndarray:
+    """
+    Test signal at times t (s), -1..1: 120 BPM kick, chord, a lead sweeping
+    0.5..8 kHz (so every band moves), off-beat hi-hat and a little noise.
+    """
+    rng = np.random.default_rng(int(t[0] * 1000) if t.shape[0] else 0)
+    beat = (t * 2.0) % 1.0
+    x = 0.5 * np.sin(2 * np.pi * (50 + 60 * np.exp(-beat * 30)) * t) * np.exp(-beat * 8)
+    for f in (220.0, 277.2, 329.6):
+        x += 0.08 * np.sin(2 * np.pi * f * t)
+    # faza liczona analitycznie (f = 500 * 16^(ramp)), bez skoków między blokami
+    period = 8.0
+    ramp = (t % period) / period
+    k = np.log(16.0)
+    phase = 500.0 * period * (np.exp(k * ramp) - 1.0) / k
+    x += 0.1 * np.sin(2 * np.pi * phase) * (0.6 + 0.4 * np.sin(2 * np.pi * 4.0 * t) ** 2)
+    hat = ((t * 4.0 + 0.5) % 1.0) < 0.03
+    x += 0.05 * hat * rng.standard_normal(t.shape[0])
+    x += 0.001 * rng.standard_normal(t.shape[0])
+    return np.clip(x, -1.0, 1.0)
+
+
+def load_wav(path: str, samplerate: int | None = None):
+    """16-bit PCM WAV -> (float32 (frames, channels), rate); resampled (linear) when samplerate differs."""
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV is supported")
+        ch, sr = f.getnchannels(), f.getframerate()
+        x = np.frombuffer(f.readframes(f.getnframes()), dtype="<i2").reshape(-1, ch)
+    x = x.astype(np.float32) / 32768.0
+    if samplerate and int(samplerate) != sr and x.shape[0] > 1:
+        n = int(round(x.shape[0] * int(samplerate) / sr))
+        src = np.arange(x.shape[0]) / sr
+        dst = np.arange(n) / int(samplerate)
+        x = np.stack([np.interp(dst, src, x[:, c]) for c in range(ch)], axis=1).astype(np.float32)
+        sr = int(samplerate)
+    return x, sr
+
+
+class _PacedInput:
+    """
+    Calls callback(block, frames, None, None) every blocksize/samplerate seconds
+    from its own thread; fill(block) writes the next (blocksize, channels) samples.
+    """
+    def __init__(self, fill, *, samplerate: int, channels: int, blocksize: int, callback):
+        self._fill = fill
+        self.samplerate = int(samplerate)
+        self.channels = int(channels)
+        self.blocksize = int(blocksize)
+        self.callback = callback
+        self._buf = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.blocks = 0
+
+    def _run(self):
+        period = self.blocksize / float(self.samplerate)
+        t_next = time.monotonic()
+        while not self._stop.is_set():
+            t_next += period
+            rest = t_next - time.monotonic()
+            if rest > 0:
+                self._stop.wait(rest)
+            elif rest < -0.5:
+                t_next = time.monotonic()   # zatrzymany proces / debugger: bez nadrabiania
+            self._fill(self._buf)
+            self.blocks += 1
+            try:
+                self.callback(self._buf, self.blocksize, None, None)
+            except Exception:
+                pass
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        t, self._thread = self._thread, None
+        if t is not None:
+            t.join(timeout=1.0)
+
+    def close(self):
+        self.stop()
+
+
+class SynthInput(_PacedInput):
+    def __init__(self, **kw):
+        super().__init__(self._synth, **kw)
+        self._n = 0
+
+    def _synth(self, out: np.ndarray):
+        t = (self._n + np.arange(self.blocksize)) / float(self.samplerate)
+        self._n += self.blocksize
+        out[:] = synth(t).astype(np.float32)[:, None]
+
+
+class WavInput(_PacedInput):
+    """WAV file played in a loop; channels are averaged or repeated to match `channels`."""
+    def __init__(self, path: str, **kw):
+        super().__init__(self._play, **kw)
+        x, _ = load_wav(path, self.samplerate)
+        if x.shape[1] != self.channels:
+            x = np.repeat(x.mean(axis=1, keepdims=True), self.channels, axis=1)
+        if x.shape[0] < self.blocksize:
+            x = np.resize(x, (self.blocksize, self.channels))
+        self._x = x
+        self._pos = 0
+
+    def _play(self, out: np.ndarray):
+        n, i = self.blocksize, self._pos
+        k = min(n, self._x.shape[0] - i)
+        out[:k] = self._x[i : i + k]
+        if k < n:
+            out[k:] = self._x[: n - k]
+        self._pos = (i + n) % self._x.shape[0]
@@ -0,0 +1,196 @@
+# firmware/hal/ble_socket.py
+# Local stand-in for the BLE GATT server: the same characteristics over a unix
+# socket, so the app protocol (JSON / ctrl_proto writes, ACK, STATE deltas,
+# SPECTRUM) can be driven by scripts on a machine without BlueZ.
+#
+# Framing, both directions: <op u8> <chr u8> <len u16 LE> <payload>
+#   op   OP_WRITE (client)  write to chr (only CHR_CMD is writable)
+#        OP_READ  (client)  read chr, answered with OP_VALUE
+#        OP_VALUE (server)  value of a read
+#        OP_NOTIFY (server) notification; every client is subscribed to
+#                           STATE, ACK and SPECTRUM from the moment it connects
+#   chr  CHR_CMD, CHR_STATE, CHR_ACK, CHR_PARAMS, CHR_SPECTRUM
+#        (same order as in VisualizerService)
+# Timing follows the GATT server: STATE deltas at most every NOTIFY_MIN_S,
+# OK acks coalesced per ACK_MIN_S, spectrum at "spectrum_hz".
+
+import os
+import select
+import socket
+import struct
+import time
+
+from firmware.bt import ctrl_proto as proto
+from firmware.bt.shared_state import SHARED, SPECTRUM, handle_cmd, json_bytes, pack_delta, schema_json
+
+OP_WRITE = 0x01
+OP_READ = 0x02
+OP_VALUE = 0x03
+OP_NOTIFY = 0x04
+
+CHR_CMD = 0
+CHR_STATE = 1
+CHR_ACK = 2
+CHR_PARAMS = 3
+CHR_SPECTRUM = 4
+
+NOTIFY_MIN_S = 0.10   # jak w ble_gatt_server
+ACK_MIN_S = 0.05
+MTU = 247             # typowe MTU po negocjacji z telefonem
+
+_HDR = struct.Struct("<BBH")
+
+
+def frame(op: int, chr_id: int, payload: bytes = b"") -> bytes:
+    return _HDR.pack(op, chr_id, len(payload)) + payload
+
+
+def unframe(buf: bytearray):
+    """Complete frames from the front of buf (consumed) -> [(op, chr, payload)]."""
+    out = []
+    while len(buf) >= _HDR.size:
+        op, chr_id, n = _HDR.unpack_from(buf, 0)
+        if len(buf) < _HDR.size + n:
+            break
+        out.append((op, chr_id, bytes(buf[_HDR.size : _HDR.size + n])))
+        del buf[: _HDR.size + n]
+    return out
+
+
+class _Client:
+    """One connection: its STATE subscription and ACK state (the AckCharacteristic part)."""
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.rx = bytearray()
+        self.sub = SHARED.subscribe()
+        self.sub.poll()   # klient i tak zaczyna od odczytu STATE
+        self.last_ack = proto.encode_ack(proto.K_ACK, 0)
+        self._pending_seq = None
+        self._t_ack = 0.0
+
+    def send(self, op: int, chr_id: int, payload: bytes):
+        self.sock.sendall(frame(op, chr_id, payload))
+
+    def _ack(self, pkt: bytes):
+        self.last_ack = pkt
+        self.send(OP_NOTIFY, CHR_ACK, pkt)
+
+    def ok(self, seq: int):
+        self._pending_seq = seq
+        self.flush_ack(time.monotonic())
+
+    def error(self, seq: int, status: int, field_id: int = 0):
+        self._ack(proto.encode_ack(proto.K_ERR, seq, status, field_id))
+
+    def flush_ack(self, now: float):
+        """Sends the newest pending OK, but at most one per ACK_MIN_S (older seqs are covered by it)."""
+        seq = self._pending_seq
+        if seq is not None and (now - self._t_ack) >= ACK_MIN_S:
+            self._pending_seq = None
+            self._t_ack = now
+            self._ack(proto.encode_ack(proto.K_ACK, seq))
+
+
+class SocketServer:
+    def __init__(self, path: str):
+        self.path = path
+        self.clients: dict = {}
+        self._params = schema_json()
+        self._seq = 0
+        self._t_state = 0.0
+        self._t_spec = 0.0
+
+    def _open(self) -> socket.socket:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.bind(self.path)
+        s.listen(4)
+        print(f"[BLE] socket stand-in at {self.path}")
+        return s
+
+    def _drop(self, c: _Client):
+        self.clients.pop(c.sock, None)
+        try:
+            c.sock.close()
+        except OSError:
+            pass
+
+    def _request(self, c: _Client, op: int, chr_id: int, payload: bytes):
+        if op == OP_WRITE and chr_id == CHR_CMD:
+            handle_cmd(payload, c)
+        elif op == OP_READ and chr_id == CHR_STATE:
+            c.send(OP_VALUE, CHR_STATE, json_bytes(SHARED.snapshot()))
+        elif op == OP_READ and chr_id == CHR_PARAMS:
+            c.send(OP_VALUE, CHR_PARAMS, self._params)
+        elif op == OP_READ and chr_id == CHR_ACK:
+            c.send(OP_VALUE, CHR_ACK, c.last_ack)
+
+    def _tick(self, now: float):
+        for c in list(self.clients.values()):
+            try:
+                c.flush_ack(now)
+                if (now - self._t_state) >= NOTIFY_MIN_S:
+                    delta = c.sub.poll()
+                    for pkt in pack_delta(delta, MTU - 3) if delta else ():
+                        c.send(OP_NOTIFY, CHR_STATE, pkt)
+            except OSError:
+                self._drop(c)
+        if (now - self._t_state) >= NOTIFY_MIN_S:
+            self._t_state = now
+
+        hz = max(1, int(SHARED.state.get("spectrum_hz", 20)))
+        if (now - self._t_spec) >= 1.0 / hz:
+            self._t_spec = now
+            item = SPECTRUM.take() if self.clients else None
+            if item is not None:
+                pkt = proto.pack_spectrum(self._seq, *item)
+                self._seq = (self._seq + 1) & 0xFF
+                for c in list(self.clients.values()):
+                    try:
+                        c.send(OP_NOTIFY, CHR_SPECTRUM, pkt)
+                    except OSError:
+                        self._drop(c)
+
+    def serve_forever(self):
+        lsock = self._open()
+        try:
+            while True:
+                r, _, _ = select.select([lsock, *self.clients], [], [], ACK_MIN_S / 2)
+                for s in r:
+                    if s is lsock:
+                        cs, _ = lsock.accept()
+                        cs.settimeout(1.0)
+                        self.clients[cs] = _Client(cs)
+                        continue
+                    c = self.clients.get(s)
+                    if c is None:
+                        continue
+                    try:
+                        data = s.recv(4096)
+                    except OSError:
+                        data = b""
+                    if not data:
+                        self._drop(c)
+                        continue
+                    c.rx += data
+                    try:
+                        for op, chr_id, payload in unframe(c.rx):
+                            self._request(c, op, chr_id, payload)
+                    except OSError:
+                        self._drop(c)
+                self._tick(time.monotonic())
+        finally:
+            for c in list(self.clients.values()):
+                self._drop(c)
+            lsock.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+def serve(path: str):
+    SocketServer(path).serve_forever()
@@ -0,0 +1,169 @@
+# firmware/hal/lcd_bus.py
+# Buses under LCDUI: GPIO lines (DC/RST/CS) and the SPI byte stream to the ST7789.
+
+import os
+import time
+
+import numpy as np
+
+ST_CASET = 0x2A
+ST_RASET = 0x2B
+ST_RAMWR = 0x2C
+
+
+class SpiGpioBus:
+    """The real panel: spidev + lgpio (imported here, not at module load)."""
+    def __init__(self, *, spi_bus: int, spi_dev: int, spi_hz: int, dc: int, rst: int, cs: int | None):
+        import lgpio
+        import spidev
+
+        self._lgpio = lgpio
+        self.gh = lgpio.gpiochip_open(0)
+        lgpio.gpio_claim_output(self.gh, dc, 0)
+        lgpio.gpio_claim_output(self.gh, rst, 1)
+        if cs is not None:
+            lgpio.gpio_claim_output(self.gh, cs, 1)
+
+        self.spi = spidev.SpiDev()
+        self.spi.open(spi_bus, spi_dev)
+        self.spi.max_speed_hz = spi_hz
+        self.spi.mode = 0
+
+    def gpio_write(self, pin: int, level: int):
+        self._lgpio.gpio_write(self.gh, pin, level)
+
+    def spi_write(self, data):
+        self.spi.writebytes(data)
+
+    def close(self):
+        try:
+            self.spi.close()
+        except Exception:
+            pass
+        try:
+            self._lgpio.gpiochip_close(self.gh)
+        except Exception:
+            pass
+
+
+class NullBus:
+    """Discards everything, only counts (profiling without a panel)."""
+    def __init__(self):
+        self.bytes = 0
+        self.writes = 0
+
+    def gpio_write(self, pin: int, level: int):
+        pass
+
+    def spi_write(self, data):
+        self.bytes += len(data)
+        self.writes += 1
+
+    def close(self):
+        pass
+
+
+class PngBus(NullBus):
+    """
+    ST7789 emulated in memory: CASET/RASET/RAMWR are decoded into an RGB565
+    framebuffer, which is written to `path` as PNG (at most every every_s,
+    after a complete RAMWR, and on close). rotate/mirror as given to LCDUI,
+    undone so the PNG shows the logical 320x240 screen.
+    """
+    def __init__(self, path: str, *, size: tuple, dc: int, rotate: int = 0, mirror: bool = False,
+                 every_s: float = 0.5):
+        super().__init__()
+        self.path = path
+        self.w, self.h = int(size[0]), int(size[1])
+        self.dc = int(dc)
+        self.rotate = (int(rotate) // 90 * 90) % 360
+        self.mirror = bool(mirror)
+        self.every_s = float(every_s)
+
+        self.fb = np.zeros((self.h, self.w), dtype=np.uint16)
+        self._level = 0
+        self._cmd = None
+        self._args = bytearray()
+        self._win = (0, 0, self.w - 1, self.h - 1)
+        self._pos = 0
+        self._carry = b""
+        self._dirty = False
+        self._t_save = 0.0
+        self.saved = 0
+
+    def gpio_write(self, pin: int, level: int):
+        if pin == self.dc:
+            self._level = level
+
+    def spi_write(self, data):
+        super().spi_write(data)
+        if not self._level:
+            self._command(data[0] if data else None)
+            return
+        if self._cmd in (ST_CASET, ST_RASET):
+            self._args += bytes(data)
+            if len(self._args) >= 4:
+                a = self._args
+                lo, hi = (a[0] << 8) | a[1], (a[2] << 8) | a[3]
+                x0, y0, x1, y1 = self._win
+                self._win = (lo, y0, hi, y1) if self._cmd == ST_CASET else (x0, lo, x1, hi)
+                self._args.clear()
+        elif self._cmd == ST_RAMWR:
+            self._ram(bytes(data))
+
+    def _command(self, c):
+        if self._cmd == ST_RAMWR and self._dirty and (time.monotonic() - self._t_save) >= self.every_s:
+            self.save()
+        self._cmd = c
+        self._args.clear()
+        self._pos = 0
+        self._carry = b""
+
+    def _ram(self, b: bytes):
+        b = self._carry + b
+        n = len(b) // 2
+        self._carry = b[2 * n :]
+        if n == 0:
+            return
+        x0, y0, x1, y1 = self._win
+        ww, wh = x1 - x0 + 1, y1 - y0 + 1
+        if ww <= 0 or wh <= 0:
+            return
+        idx = np.arange(self._pos, min(self._pos + n, ww * wh))
+        self._pos += n
+        if idx.size == 0:
+            return
+        ys, xs = y0 + idx // ww, x0 + idx % ww
+        ok = (ys < self.h) & (xs < self.w)
+        px = np.frombuffer(b, dtype=">u2", count=idx.size)
+        self.fb[ys[ok], xs[ok]] = px[ok]
+        self._dirty = True
+
+    def image(self) -> np.ndarray:
+        """Framebuffer as RGB888, logical orientation."""
+        v = self.fb
+        if self.mirror:
+            v = np.fliplr(v)
+        v = np.rot90(v, k=-(self.rotate // 90)).astype(np.uint32)
+        rgb = np.empty(v.shape + (3,), dtype=np.uint8)
+        rgb[..., 0] = ((v >> 11) & 0x1F) * 255 // 31
+        rgb[..., 1] = ((v >> 5) & 0x3F) * 255 // 63
+        rgb[..., 2] = (v & 0x1F) * 255 // 31
+        return rgb
+
+    def save(self):
+        from PIL import Image
+
+        tmp = self.path + ".tmp"
+        Image.fromarray(self.image(), "RGB").save(tmp, format="PNG")
+        os.replace(tmp, self.path)
+        self._dirty = False
+        self._t_save = time.monotonic()
+        self.saved += 1
+
+    def close(self):
+        if self._dirty:
+            try:
+                self.save()
+            except Exception:
+                pass
@@ -0,0 +1,72 @@
+# firmware/hal/serial_link.py
+# Stand-ins for the ESP32 UART (pyserial.Serial subset used by Esp32SerialDriver).
+
+import os
+import time
+
+
+class MemoryLink:
+    """
+    In-memory link. Keeps counters and the last packet; with baud set,
+    write() takes as long as the bytes would on the wire (8N1), so
+    LedSender timing matches the real matrix.
+    """
+    def __init__(self, baud: int | None = None):
+        self.baud = None if not baud else int(baud)
+        self.out_waiting = 0
+        self.bytes = 0
+        self.writes = 0
+        self.last = b""
+
+    def write(self, data) -> int:
+        n = len(data)
+        self.bytes += n
+        self.writes += 1
+        self.last = bytes(data)
+        if self.baud:
+            time.sleep(n * 10.0 / self.baud)
+        return n
+
+    def close(self):
+        pass
+
+
+class PtyLink:
+    """
+    Pseudo-terminal link: packets come out of the slave end (path), where an
+    ESP32 simulator or `cat path | xxd` can read them. Nobody reading ->
+    bytes that do not fit the tty buffer are dropped, like a UART without
+    a receiver, instead of blocking the LED thread.
+    """
+    def __init__(self):
+        import tty
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self.path = os.ttyname(self._slave)
+        self.out_waiting = 0
+        self.bytes = 0
+        self.writes = 0
+        self.dropped = 0
+        print(f"[PTY] ESP32 link at {self.path}")
+
+    def write(self, data) -> int:
+        mv = memoryview(data)
+        n = len(mv)
+        self.writes += 1
+        while mv:
+            try:
+                k = os.write(self._master, mv)
+            except (BlockingIOError, InterruptedError):
+                self.dropped += len(mv)
+                break
+            self.bytes += k
+            mv = mv[k:]
+        return n
+
+    def close(self):
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
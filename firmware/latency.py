@@ -0,0 +1,64 @@
+# firmware/latency.py
+# Per-stage latency histograms, audio capture -> LED frame on the wire.
+#
+# Every frame LedSender actually transmits carries the timestamps of its
+# pipeline (time.monotonic()) and adds one sample per stage:
+#   feat    capture of the newest analyzed sample -> features ready
+#   fx      features ready -> effect frame built (incl. wait for the LED tick)
+#   queue   frame built -> picked up by LedSender (incl. the BT delay pts wait)
+#   serial  picked up -> last byte out of the UART (write + estimated drain)
+#   total   capture -> last byte out of the UART
+# Percentiles are computed over the last `size` samples of each stage.
+
+import threading
+
+import numpy as np
+
+STAGES = ("feat", "fx", "queue", "serial", "total")
+
+
+class LatencyStats:
+    def __init__(self, size: int = 512):
+        self.size = int(size)
+        self._lock = threading.Lock()
+        self._buf = {s: np.zeros(self.size, dtype=np.float32) for s in STAGES}
+        self._n = {s: 0 for s in STAGES}
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            n = self._n[stage]
+            self._buf[stage][n % self.size] = seconds * 1000.0
+            self._n[stage] = n + 1
+
+    def add_frame(self, t_audio: float, t_feats: float, t_frame: float, t_pick: float, t_out: float):
+        for stage, dt in (
+            ("feat", t_feats - t_audio),
+            ("fx", t_frame - t_feats),
+            ("queue", t_pick - t_frame),
+            ("serial", t_out - t_pick),
+            ("total", t_out - t_audio),
+        ):
+            self.add(stage, max(0.0, dt))
+
+    def percentiles(self) -> dict:
+        """stage -> (p50, p95, p99) in ms; stages without samples are left out."""
+        out = {}
+        with self._lock:
+            for s in STAGES:
+                n = min(self._n[s], self.size)
+                if n:
+                    p = np.percentile(self._buf[s][:n], (50, 95, 99))
+                    out[s] = (float(p[0]), float(p[1]), float(p[2]))
+        return out
+
+    def summary(self, pct: dict | None = None) -> str:
+        pct = self.percentiles() if pct is None else pct
+        return " | ".join(f"{s} {a:.0f}/{b:.0f}/{c:.0f}" for s, (a, b, c) in pct.items())
+
+    def reset(self):
+        with self._lock:
+            for s in STAGES:
+                self._n[s] = 0
+
+
+LATENCY = LatencyStats()
@@ -1,7 +1,6 @@
-import os
 import threading
-import serial
-import time
+
+from firmware import hal
 
 SYNC1 = 0xAA
 SYNC2 = 0x55
@@ -22,8 +21,11 @@ class Esp32SerialDriver:
     Protokół zgodny z ESP32 receiver:
       AA 55 <frame_id> <len_lo> <len_hi> <payload RGB...> <crc8(payload)>
     Payload: row-major 16x16 (y*W + x), 768B.
+
+    link: obiekt z write()/out_waiting/close(); None -> firmware.hal
+    (VIS_LED_BACKEND: prawdziwy port szeregowy, pty albo pamięć).
     """
-    def __init__(self, num_leds=256, port="/dev/ttyUSB0", baud=115200, debug=False):
+    def __init__(self, num_leds=256, port="/dev/ttyUSB0", baud=115200, debug=False, link=None):
         self.num_leds = int(num_leds)
         self.frame_len = self.num_leds * 3
         self.buf = bytearray(self.frame_len)
@@ -33,10 +35,11 @@ class Esp32SerialDriver:
 
         self.port = port
         self.baud = int(baud)
+        # czas wysłania jednej ramki (8N1 = 10 bitów/bajt), ~67 ms przy 115200
+        self.tx_s = (self.frame_len + 6) * 10.0 / self.baud
+        self.drain_s = 0.0
 
-        self.ser = serial.Serial(self.port, self.baud, timeout=0, write_timeout=1)
-        # mała pauza po otwarciu, czasem pomaga na CH340
-        time.sleep(0.08)
+        self.ser = link if link is not None else hal.open_serial(self.port, self.baud)
 
         if self.debug:
             print(f"[ESPDRV] open port={self.port} baud={self.baud} frame_len={self.frame_len}")
@@ -51,6 +54,14 @@ class Esp32SerialDriver:
             self.buf[j+1] = int(g) & 0xFF
             self.buf[j+2] = int(b) & 0xFF
 
+    def set_frame(self, payload):
+        """Cały bufor naraz (RGB row-major, frame_len bajtów) zamiast set_pixel w pętli."""
+        mv = memoryview(payload)
+        if mv.nbytes != self.frame_len:
+            raise ValueError(f"frame: {mv.nbytes} B, expected {self.frame_len}")
+        with self.lock:
+            self.buf[:] = mv
+
     def fill(self, rgb):
         r, g, b = (int(rgb[0]) & 0xFF, int(rgb[1]) & 0xFF, int(rgb[2]) & 0xFF)
         row = bytes((r, g, b))
@@ -71,6 +82,12 @@ class Esp32SerialDriver:
         if self.debug and n != len(pkt):
             print(f"[ESPDRV] short write n={n} want={len(pkt)}")
 
+        # ile jeszcze potrwa, zanim ostatni bajt wyjdzie z UART (bufor wyjściowy OS)
+        try:
+            self.drain_s = self.ser.out_waiting * 10.0 / self.baud
+        except Exception:
+            self.drain_s = self.tx_s
+
         self.frame_id = (self.frame_id + 1) & 0xFF
 
     def clear(self):
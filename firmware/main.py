@@ -1,32 +1,32 @@
 #!/usr/bin/env python3
 # firmware/main.py
 # Run: sudo -E python3 -u -m firmware.main
+# Bez sprzętu (dowolny Linux): VIS_HAL=sim python3 -u -m firmware.main  (backendy: firmware/hal)
 
 import asyncio
+import collections
 import traceback
 import sys
 import threading
 import time
 import queue
-import subprocess
 import numpy as np
-import sounddevice as sd
 
 from firmware.ui.lcd_ui import LCDUI
 from firmware.audio.features import FeatureExtractor
-from firmware.audio.bt_bluealsa import BlueAlsaInput
+from firmware.audio.bt_source import BtSource
+from firmware.audio.convert import to_mono, dc_gain
+from firmware.audio.mix import MixAnalyzer
+from firmware.audio.ring import AudioRing
 from firmware.led.esp32_serial_driver import Esp32SerialDriver
 
-from firmware.effects.bars import BarsEffect
-from firmware.effects.oscilloscope import OscilloscopeEffect
-from firmware.effects.radial_pulse import RadialPulseEffect
-from firmware.effects.spectral_fire import SpectralFireEffect
-from firmware.effects.plasma import PlasmaEffect
-from firmware.effects.spiral import SpiralEffect
-from firmware.effects.ripple import RippleEffect
-from firmware.effects.kaleidoscope import KaleidoscopeEffect
+from firmware.effects import make_effects
+from firmware.effects.profiler import EffectProfiler
 
-from firmware.bt.ble_gatt_server import start_ble, SHARED
+from firmware import hal
+from firmware.bt.shared_state import SHARED, SPECTRUM
+from firmware.params import CLIENT_KEYS, resolve as resolve_params
+from firmware.latency import LATENCY
 
 try:
     from firmware.bt.metadata import BtMetadata, bt_metadata_loop
@@ -44,7 +44,28 @@ PORT = "/dev/ttyUSB0"
 BAUD = 115200
 
 FPS_LED = 20.0
-FPS_LCD = 20.0
+FPS_LCD = 30.0        # live pane (spektrum + podgląd LED)
+FPS_LCD_FULL = 2.0    # reszta ekranu
+
+LAT_PUBLISH_S = 1.0   # percentyle opóźnień -> BLE
+LAT_LOG_S = 10.0      # -> log
+
+FX_BUDGET = 0.4       # część klatki LED na effect.update(); reszta na analizę i wysyłkę
+
+FPS_LED_IDLE = 5.0    # w ciszy / pauzie
+FPS_LCD_IDLE = 2.0
+IDLE_RMS = 0.004      # jak RMS_GATE w FeatureExtractor
+IDLE_AFTER_S = 4.0    # cisza tyle czasu -> idle
+IDLE_PAUSED_S = 1.0   # AVRCP paused/stopped -> idle szybciej
+IDLE_SLEEP = 0.01     # krok pętli w idle (zamiast 1 ms)
+BLOCK_STALE_S = 0.5   # tyle bez nowego bloku -> źródło stoi, dla idle to cisza
+
+LED_KEEPALIVE_S = 2.0  # powtórka ostatniej klatki, gdy nic się nie zmienia
+LED_MAX_PENDING = 32   # klatki czekające na swój pts (opóźnienie BT)
+LED_LEAD_S = 0.03      # zapas ponad czas transmisji: tyle klatka czeka w LedSender
+
+XFADE_S = 0.3             # przejście mic <-> BT
+RING_S = 2.0              # historia mikrofonu (tryb mix)
 
 SR = 44100
 NFFT = 1024
@@ -59,71 +80,10 @@ def clamp8(x: int) -> int:
     return 0 if x < 0 else (255 if x > 255 else int(x))
 
 
-def f01(v, default):
-    try:
-        x = float(v)
-    except Exception:
-        x = float(default)
-    return max(0.0, min(1.0, x))
-
-
-def clamp_gain(v, default=1.0):
-    try:
-        g = float(v)
-    except Exception:
-        g = float(default)
-    if not np.isfinite(g):
-        g = float(default)
-    return max(0.05, min(6.0, g))
-
-
-def bt_is_connected(addr: str) -> bool:
-    if not addr:
-        return False
-    try:
-        out = subprocess.check_output(["bluetoothctl", "info", addr], text=True, stderr=subprocess.DEVNULL)
-        return "Connected: yes" in out
-    except Exception:
-        return False
-
-
-def bt_has_a2dp_pcm(addr: str) -> bool:
-    if not addr:
-        return False
-    try:
-        out = subprocess.check_output(["bluealsa-aplay", "-L"], text=True, stderr=subprocess.DEVNULL)
-        return f"DEV={addr}" in out and "PROFILE=a2dp" in out
-    except Exception:
-        return False
-
-
-def bt_autoconnect(addr: str, tries: int = 6, delay: float = 0.35) -> bool:
-    if not addr:
-        return False
-    subprocess.run(["bluetoothctl", "power", "on"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    for _ in range(tries):
-        subprocess.run(["bluetoothctl", "connect", addr], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        time.sleep(delay)
-        if bt_is_connected(addr):
-            return True
-    return bt_is_connected(addr)
-
-
-def make_effects(w=W, h=H):
-    return {
-        "bars": BarsEffect(w=w, h=h),
-        "osc": OscilloscopeEffect(w=w, h=h),
-        "pulse": RadialPulseEffect(w=w, h=h),
-        "fire": SpectralFireEffect(w=w, h=h),
-        "plasma": PlasmaEffect(w=w, h=h),
-        "spiral": SpiralEffect(w=w, h=h),
-        "ripple": RippleEffect(w=w, h=h),
-        "kaleidoscope": KaleidoscopeEffect(w=w, h=h),
-    }
-
-
-def safe_update_effect(effect, feats, dt, params, effect_name: str):
+def safe_update_effect(effect, feats, dt, params, effect_name: str, profiler: EffectProfiler | None = None):
     try:
+        if profiler is not None:
+            return profiler.update(effect_name, effect, feats, dt, params)
         try:
             frame = effect.update(feats, dt, params)
         except TypeError:
@@ -153,140 +113,383 @@ def sanitize_feats(feats: dict):
     return feats
 
 
-def get_state():
-    try:
-        return SHARED.snapshot()
-    except Exception:
-        return {}
+def blend_feats(prev: dict, cur: dict, a: float) -> dict:
+    """Crossfade of two feature dicts; a = weight of cur (0..1)."""
+    out = dict(cur)
+    b = 1.0 - a
+    for k in ("rms", "bass", "mid", "treble"):
+        out[k] = b * float(prev.get(k, 0.0)) + a * float(cur.get(k, 0.0))
+    out["bands"] = (b * prev["bands"] + a * cur["bands"]).astype(np.float32)
+    out["beat"] = bool(cur.get("beat", False) if a >= 0.5 else prev.get("beat", False))
+    return out
+
+
+def debug_lines(lat: dict, led_sender, ui, audio, idle, profiler) -> list:
+    """Text of the LCD debug page: latency percentiles + sink/source/effect counters."""
+    lines = ["LATENCY ms  p50  p95  p99"]
+    for stage, (a, b, c) in lat.items():
+        lines.append(f"{stage:<9}{a:5.0f}{b:5.0f}{c:5.0f}")
+    lines.append(f"led sent={led_sender.sent} dup={led_sender.suppressed} late={led_sender.late}")
+    lines.append(f"lcd push={ui.pushed} dup={ui.suppressed}")
+    bt = audio.bt
+    lines.append(f"bt {bt.status} blk={bt.blocks} und={bt.underruns} rst={bt.restarts}")
+    lines.append(f"idle={'yes' if idle.idle else 'no'} wake={idle.wakeups}")
+    rep = profiler.report()
+    if rep:
+        k, r = max(rep.items(), key=lambda kv: kv[1]["p95"])
+        lines.append(f"fx {k} p95={r['p95']:.1f}ms L{r['level']}")
+    return lines
 
 
 def ble_thread():
     try:
-        start_ble()
+        hal.start_ble()
     except Exception as e:
         log_exc("BLE thread", e)
 
 
 class LedSender(threading.Thread):
-    def __init__(self, leds: Esp32SerialDriver):
+    """
+    Serial writer thread. Frames whose bytes equal the last transmitted one
+    are not sent again (counted in suppressed); the last frame is repeated
+    every keepalive_s so the matrix recovers after an ESP32 reset.
+
+    submit(frame, pts) may carry a presentation time (time.monotonic()):
+    the frame is written so that it finishes arriving at pts (the serial
+    transfer itself takes leds.tx_s). Without pts a frame is sent at once.
+    When several frames are due, only the newest is sent (late ones are
+    dropped, counted in late).
+
+    stamps = (t_audio, t_feats, t_frame) of a frame go to LATENCY together
+    with the pick-up time and the moment its last byte leaves the UART.
+    """
+    def __init__(self, leds: Esp32SerialDriver, keepalive_s: float = LED_KEEPALIVE_S):
         super().__init__(daemon=True)
         self.leds = leds
-        self.q: "queue.Queue[list[tuple[int,int,int]]]" = queue.Queue(maxsize=1)
+        self._pending: "collections.deque[tuple[float, list, tuple | None]]" = collections.deque(maxlen=LED_MAX_PENDING)
+        self._cv = threading.Condition()
         self._stop = threading.Event()
+        self.keepalive_s = float(keepalive_s)
+        self.tx_s = float(getattr(leds, "tx_s", 0.0))
+
+        self._last = None
+        self._t_sent = 0.0
+        self.sent = 0
+        self.suppressed = 0
+        self.keepalives = 0
+        self.late = 0
+
+    def submit(self, frame, pts: float | None = None, stamps: tuple | None = None):
+        with self._cv:
+            if pts is None:
+                # bez znacznika czasu: najnowsza wygrywa, jak wcześniej
+                self._pending.clear()
+                pts = 0.0
+            self._pending.append((pts, frame, stamps))
+            self._cv.notify()
+
+    def _next_due(self):
+        """Newest (pts, frame, stamps) whose send time has come, or None after waiting a bit."""
+        with self._cv:
+            if not self._pending:
+                self._cv.wait(0.2)
+                if not self._pending:
+                    return None
+            now = time.monotonic()
+            due = self._pending[0][0] - self.tx_s
+            if due > now:
+                self._cv.wait(min(0.2, due - now))
+                return None
+            item = self._pending.popleft()
+            while self._pending and (self._pending[0][0] - self.tx_s) <= now:
+                item = self._pending.popleft()
+                self.late += 1
+            return item
+
+    def _send(self, payload: bytes):
+        self.leds.set_frame(payload)
+        self.leds.show()
+        self._last = payload
+        self._t_sent = time.monotonic()
 
-    def submit(self, frame):
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                item = self._next_due()
+                t_pick = time.monotonic()
+                payload = None if item is None else \
+                    np.clip(np.asarray(item[1], dtype=np.int32), 0, 255).astype(np.uint8).tobytes()
+            except Exception as e:
+                log_exc("LED sender", e)
+                continue
+            try:
+                if payload is not None and payload != self._last:
+                    self._send(payload)
+                    self.sent += 1
+                    if item[2] is not None:
+                        LATENCY.add_frame(*item[2], t_pick, self._t_sent + float(getattr(self.leds, "drain_s", 0.0)))
+                elif self._last is not None and (time.monotonic() - self._t_sent) >= self.keepalive_s:
+                    self._send(self._last)
+                    self.keepalives += 1
+                elif payload is not None:
+                    self.suppressed += 1
+            except Exception as e:
+                log_exc("LED sender", e)
+
+    def stop(self):
+        self._stop.set()
+        with self._cv:
+            self._cv.notify()
+
+
+class LcdPresenter(threading.Thread):
+    """
+    Renders LCDUI in the background so SPI pushes never stall the LED loop.
+    submit() takes a fresh UI state dict (the caller must not mutate it after);
+    only the newest pending state is drawn, older ones are dropped.
+
+    The full screen is redrawn at full_fps (or at once when the layout changes),
+    in between only the live parts (spectrum/LED pane, scrolling titles) are
+    pushed as windowed updates.
+    """
+    def __init__(self, ui: LCDUI, max_fps: float = FPS_LCD, full_fps: float = FPS_LCD_FULL):
+        super().__init__(daemon=True)
+        self.ui = ui
+        self.q: "queue.Queue[dict]" = queue.Queue(maxsize=1)
+        self._stop_ev = threading.Event()
+        self.min_dt = 1.0 / max(0.1, float(max_fps))
+        self.full_dt = 1.0 / max(0.1, float(full_fps))
+        self._t_full = 0.0
+        self._layout = None
+
+        self.fps = 0.0
+        self.frames = 0
+        self.skipped = 0
+
+    def submit(self, state: dict):
         try:
             while True:
                 self.q.get_nowait()
-        except Exception:
+                self.skipped += 1
+        except queue.Empty:
             pass
         try:
-            self.q.put_nowait(frame)
-        except Exception:
-            pass
+            self.q.put_nowait(state)
+        except queue.Full:
+            self.skipped += 1
+
+    def _apply(self, st: dict):
+        ui = self.ui
+        ui.set_mode(st.get("mode", "mic"))
+        ui.set_effect(st.get("effect", ""))
+        ui.set_visual_params(intensity=st.get("intensity", 0.75), color_mode=st.get("color_mode", "auto"))
+        ui.set_audio_params(gain=st.get("gain", 1.0), smoothing=st.get("smoothing", 0.65))
+        ui.set_mic_feats(
+            rms=st.get("rms", 0.0),
+            bass=st.get("bass", 0.0),
+            mid=st.get("mid", 0.0),
+            treble=st.get("treble", 0.0),
+        )
+        bt = st.get("bt")
+        if bt is not None:
+            ui.set_bt(connected=bt["connected"], device_name=bt["device_name"], device_addr=bt["device_addr"])
+        track = st.get("track")
+        if track is not None:
+            ui.set_track(artist=track["artist"], title=track["title"], album=track["album"], cover_url=track["cover_url"])
+            ui.set_playback(position_ms=track["position_ms"], duration_ms=track["duration_ms"], playing=track["playing"])
+        ui.set_status(st.get("status", ""))
+        ui.set_page(st.get("page", "main"))
+        if "debug" in st:
+            ui.set_debug(st["debug"])
+        if "bands" in st:
+            ui.set_spectrum(st["bands"])
+        if "frame" in st:
+            ui.set_led_frame(st["frame"])
+
+    @staticmethod
+    def _layout_key(st: dict):
+        bt = st.get("bt") or {}
+        track = st.get("track") or {}
+        return (
+            st.get("mode"), st.get("page"), st.get("effect"), bt.get("connected"),
+            track.get("title"), track.get("artist"), track.get("cover_url"),
+        )
 
     def run(self):
-        while not self._stop.is_set():
+        t_prev = None
+        while not self._stop_ev.is_set():
             try:
-                frame = self.q.get(timeout=0.2)
-            except Exception:
+                st = self.q.get(timeout=0.2)
+            except queue.Empty:
                 continue
             try:
-                for i, (r, g, b) in enumerate(frame):
-                    self.leds.set_pixel(i, (clamp8(r), clamp8(g), clamp8(b)))
-                self.leds.show()
+                self._apply(st)
+                key = self._layout_key(st)
+                t = time.monotonic()
+                if key != self._layout or (t - self._t_full) >= self.full_dt:
+                    self._layout = key
+                    self._t_full = t
+                    self.ui.render()
+                else:
+                    self.ui.render_live()
             except Exception as e:
-                log_exc("LED sender", e)
+                log_exc("LCDUI.render()", e)
+
+            now = time.monotonic()
+            if t_prev is not None:
+                inst = 1.0 / max(1e-6, now - t_prev)
+                self.fps = inst if self.fps <= 0.0 else (0.9 * self.fps + 0.1 * inst)
+            t_prev = now
+            self.frames += 1
+
+            # nie szybciej niż max_fps; w tym czasie submit() i tak nadpisuje stan
+            rest = self.min_dt - (time.monotonic() - now)
+            if rest > 0:
+                self._stop_ev.wait(rest)
 
     def stop(self):
-        self._stop.set()
+        self._stop_ev.set()
+
+
+class IdleMonitor:
+    """
+    Active/idle state machine for the main loop.
+
+    Goes idle after idle_after_s of input below the silence gate (paused_s
+    when the AVRCP player reports paused/stopped). While idle the loop runs
+    at reduced LED/LCD rates and skips the FFT; the first block above the
+    gate, a beat or any state write from the app wakes it on the spot.
+    """
+    def __init__(self, rms_gate=IDLE_RMS, idle_after_s=IDLE_AFTER_S, paused_s=IDLE_PAUSED_S):
+        self.rms_gate = float(rms_gate)
+        self.idle_after_s = float(idle_after_s)
+        self.paused_s = float(paused_s)
+        self.idle = False
+        self._t_quiet = None
+
+        self.wakeups = 0
+        self.idle_s = 0.0
+        self._t_idle = 0.0
+
+    def update(self, now: float, rms: float, beat: bool = False, paused: bool = False, poke: bool = False) -> bool:
+        if poke or beat or rms >= self.rms_gate:
+            self._t_quiet = None
+            if self.idle:
+                self.idle = False
+                self.wakeups += 1
+                self.idle_s += now - self._t_idle
+            return False
+
+        if self._t_quiet is None:
+            self._t_quiet = now
+        if not self.idle:
+            limit = self.paused_s if paused else self.idle_after_s
+            if (now - self._t_quiet) >= limit:
+                self.idle = True
+                self._t_idle = now
+        return self.idle
 
 
 class AudioHub:
-    def __init__(self, sr=SR, nfft=NFFT):
+    """
+    Mic (capture callback from firmware.hal: sounddevice, WAV or synthetic)
+    + supervised BT source (BtSource thread).
+    Both stay open while a BT device is around (warm standby), so a source
+    change is only select(). fade() tells the caller how far the crossfade
+    to the new source is; each source has its own FeatureExtractor and the
+    features are blended, not the samples.
+    """
+    def __init__(self, sr=SR, nfft=NFFT, xfade_s=XFADE_S):
         self.sr = int(sr)
         self.nfft = int(nfft)
+        self.xfade_s = float(xfade_s)
 
         self._lock = threading.Lock()
         self._mic_latest = np.zeros(self.nfft, dtype=np.float32)
-        self._bt_latest = np.zeros(self.nfft, dtype=np.float32)
+        self.mic_ring = AudioRing(int(RING_S * self.sr))
 
-        self._mic: sd.InputStream | None = None
-        self._bt: BlueAlsaInput | None = None
-        self._bt_stop = threading.Event()
-        self._bt_thread: threading.Thread | None = None
+        self._mic = None
+        self.bt = BtSource(sr=self.sr, nfft=self.nfft)
+
+        self.bt_delay = 0      # linia opóźniająca BT (próbki), ustawiana z pętli głównej
+        self.t_block = 0.0     # czas przechwycenia ostatniej próbki bloku z get_latest()
+        self._t_mic = 0.0
+
+        self._src = "mic"
+        self._prev_src = None
+        self._t_switch = 0.0
 
     def start_mic(self):
+        buf = np.zeros(self.nfft, dtype=np.float32)
+
         def cb(indata, frames, time_info, status):
+            nonlocal buf
             try:
-                x = indata[:, 0].astype(np.float32, copy=False)
-                if x.shape[0] >= self.nfft:
-                    x = x[: self.nfft]
-                else:
-                    pad = np.zeros(self.nfft, dtype=np.float32)
-                    pad[: x.shape[0]] = x
-                    x = pad
+                to_mono(indata, buf, channels=indata.shape[1])
+                self.mic_ring.write(buf)
                 with self._lock:
-                    self._mic_latest = x.copy()
+                    self._mic_latest, buf = buf, self._mic_latest
+                    self._t_mic = time.monotonic()
             except Exception:
                 pass
 
-        self._mic = sd.InputStream(
+        self._mic = hal.open_audio_input(
             samplerate=self.sr,
             channels=1,
             blocksize=self.nfft,
-            dtype="float32",
             callback=cb,
         )
         self._mic.start()
 
-    def _bt_worker(self):
-        while not self._bt_stop.is_set():
-            bt = self._bt
-            if bt is None or not bt.is_running():
-                time.sleep(0.05)
-                continue
-            try:
-                x = bt.read_mono_f32()
-                if x is None or x.shape[0] != self.nfft:
-                    x = np.zeros(self.nfft, dtype=np.float32)
-            except Exception:
-                x = np.zeros(self.nfft, dtype=np.float32)
-
-            with self._lock:
-                self._bt_latest = x.astype(np.float32, copy=False)
-
-            time.sleep(0.0)
-
-    def start_bt(self, bt_addr: str | None):
-        self.stop_bt()
-        self._bt_latest[:] = 0.0
-        self._bt = BlueAlsaInput(bt_addr=bt_addr, rate=self.sr, channels=2, chunk_frames=self.nfft)
-        self._bt.start()
-        self._bt_stop.clear()
-        self._bt_thread = threading.Thread(target=self._bt_worker, daemon=True)
-        self._bt_thread.start()
-
-    def stop_bt(self):
-        self._bt_stop.set()
-        bt = self._bt
-        self._bt = None
-        if bt is not None:
-            try:
-                bt.stop()
-            except Exception:
-                pass
-        with self._lock:
-            self._bt_latest[:] = 0.0
-
-    def get_latest(self, mode: str) -> np.ndarray:
+    def start_bt(self):
+        self.bt.start()
+
+    def get_latest(self, mode: str, out: np.ndarray | None = None) -> np.ndarray:
+        """Copy of the newest block; into out (preallocated, nfft) when given."""
+        if out is None:
+            out = np.empty(self.nfft, dtype=np.float32)
+        if mode == "bt":
+            if self.bt_delay > 0:
+                self.t_block = self.bt.read(out, delay=self.bt_delay)
+                return out
+            self.t_block = self.bt.t_latest
+            return self.bt.get_latest(out)
         with self._lock:
-            if mode == "bt":
-                return self._bt_latest.copy()
-            return self._mic_latest.copy()
+            np.copyto(out, self._mic_latest)
+            self.t_block = self._t_mic
+        return out
+
+    def capture_time(self, mode: str) -> float:
+        """time.monotonic() of the newest captured sample of a source."""
+        if mode == "bt":
+            return self.bt.t_latest
+        return self._t_mic
+
+    def select(self, src: str):
+        if src == self._src:
+            return
+        now = time.monotonic()
+        prev, a = self.fade()
+        if prev == src:
+            # powrót w trakcie przejścia: odwracamy je od bieżącej wagi, bez skoku
+            self._t_switch = now - (1.0 - a) * self.xfade_s
+        else:
+            self._t_switch = now
+        self._prev_src = self._src
+        self._src = src
+
+    def fade(self):
+        """-> (previous source or None, weight of the current one 0..1)."""
+        if self._prev_src is None:
+            return None, 1.0
+        a = (time.monotonic() - self._t_switch) / self.xfade_s if self.xfade_s > 0 else 1.0
+        if a >= 1.0:
+            self._prev_src = None
+            return None, 1.0
+        return self._prev_src, a
 
     def close(self):
-        self.stop_bt()
+        self.bt.close()
         if self._mic is not None:
             try:
                 self._mic.stop()
@@ -321,33 +524,31 @@ def main():
         bg=(0, 0, 0),
     )
 
+    lcd = LcdPresenter(ui, max_fps=FPS_LCD, full_fps=FPS_LCD_FULL)
+    lcd.start()
+
     leds = Esp32SerialDriver(num_leds=NUM_LEDS, port=PORT, baud=BAUD, debug=False)
     led_sender = LedSender(leds)
     led_sender.start()
 
-    fe = FeatureExtractor(samplerate=SR, nfft=NFFT, bands=16, fmin=20, fmax=20000)
+    # osobny stan analizy (wygładzanie, beat) dla każdego źródła
+    fes = {src: FeatureExtractor(samplerate=SR, nfft=NFFT, bands=16, fmin=20, fmax=20000) for src in ("mic", "bt")}
 
     audio = AudioHub(sr=SR, nfft=NFFT)
     audio.start_mic()
+    audio.start_bt()
 
-    effects = make_effects()
+    effects = make_effects(W, H)
+    profiler = EffectProfiler(budget_s=FX_BUDGET / FPS_LED)
     effect_name = "bars"
     effect = effects[effect_name]
 
-    params = {
-        "intensity": 0.75,
-        "color_mode": "auto",
-        "brightness": 0.55,
-        "gain": 1.0,
-        "smoothing": 0.65,
-        "power": 0.55,
-        "glow": 0.25,
-    }
+    # typowane parametry (firmware/params.py), przeliczane tylko przy zmianie stanu
+    params = resolve_params({})
 
     current_mode = "mic"
     bt_addr_cached = None
     bt_ready = False
-    bt_last_try = 0.0
 
     t_led = time.monotonic()
     t_lcd = time.monotonic()
@@ -361,120 +562,217 @@ def main():
         "mid": 0.0,
         "treble": 0.0,
     }
+    last_frame = [(0, 0, 0)] * NUM_LEDS
+    t_audio = t_feats = time.monotonic()
+    t_analyzed = None   # czas przechwycenia bloku, z którego są last_feats
+    t_lat_pub = t_lat_log = t_audio
+    xbuf = np.zeros(NFFT, dtype=np.float32)
+    xbuf_prev = np.zeros(NFFT, dtype=np.float32)
+    quiet_feats = dict(last_feats)
+
+    idle = IdleMonitor()
+    bt_paused = False
+
+    mixer = MixAnalyzer(SR, NFFT, bands=16, fmin=20, fmax=20000)
+
+    def analyze(src: str, buf: np.ndarray) -> dict:
+        if src == "mix":
+            audio.t_block = audio.capture_time("mic")
+            return mixer.compute(audio.mic_ring, audio.bt.ring, gain=params.gain, smoothing=params.smoothing)
+        x = dc_gain(audio.get_latest(src, out=buf), params.gain)
+        return fes[src].compute(x, smoothing=params.smoothing)
+
+    # tylko pola zapisywane przez klienta; to, co pętla sama publikuje (rms, meta_*),
+    # nie może przebudowywać parametrów
+    state_sub = SHARED.subscribe(keys=CLIENT_KEYS)
+    st = {}
 
     try:
         while True:
             now = time.monotonic()
-            st = get_state()
-
-            raw_mode = str(st.get("mode", "mic")).lower()
-            desired_mode = "bt" if (raw_mode == "bt") else "mic"
-
-            desired_fx = str(st.get("effect", effect_name)).lower()
-            if desired_fx in effects and desired_fx != effect_name:
-                effect_name = desired_fx
-                effect = effects[effect_name]
-
-            params["brightness"] = f01(st.get("brightness", params["brightness"]), params["brightness"])
-            params["intensity"] = f01(st.get("intensity", params["intensity"]), params["intensity"])
-            params["gain"] = clamp_gain(st.get("gain", params["gain"]), params["gain"])
-
-            try:
-                sm = float(st.get("smoothing", params["smoothing"]))
-                if np.isfinite(sm):
-                    params["smoothing"] = max(0.0, min(0.95, sm))
-            except Exception:
-                pass
-
-            bt_addr = (str(st.get("device_addr", "")).strip() or None)
+            # tylko zmienione pola, już zwalidowane przy zapisie (SharedState)
+            delta = state_sub.poll()
+            client_write = bool(delta)   # tylko klucze klienta (state_sub), więc to naprawdę aktywność z aplikacji
+            if delta:
+                st.update(delta)
+                fx = delta.get("effect")
+                if fx in effects and fx != effect_name:
+                    effect_name = fx
+                    effect = effects[effect_name]
+                params = resolve_params(st)
+                profiler.auto_degrade = params.fx_autodegrade
+
+            desired_mode = st.get("mode", "mic")
+
+            bt_addr = st.get("device_addr") or None
             if bt_addr:
                 bt_addr_cached = bt_addr
             elif bt_addr_cached:
                 bt_addr = bt_addr_cached
 
-            real_bt = bt_is_connected(bt_addr) if bt_addr else False
-            real_pcm = bt_has_a2dp_pcm(bt_addr) if bt_addr else False
-            bt_ready = bool(bt_addr and real_bt and real_pcm)
-
-            if desired_mode == "bt" and bt_addr and (now - bt_last_try) > 1.5 and not bt_ready:
-                bt_last_try = now
-                bt_autoconnect(bt_addr, tries=4, delay=0.35)
-
-            if desired_mode != current_mode:
-                if desired_mode == "bt":
-                    if bt_addr and bt_ready:
-                        try:
-                            audio.start_bt(bt_addr)
-                            current_mode = "bt"
-                        except Exception as e:
-                            log_exc("audio.start_bt()", e)
-                            audio.stop_bt()
-                            current_mode = "mic"
-                    else:
-                        current_mode = "mic"
-                        audio.stop_bt()
-                else:
-                    current_mode = "mic"
-                    audio.stop_bt()
+            # cały BT (connect, PCM, restarty z backoffem) żyje w wątku BtSource
+            # w trybie mic BT zostaje w gotowości (bez łączenia), przełączenie jest natychmiastowe
+            audio.bt.set_addr(bt_addr, active=(desired_mode in ("bt", "mix")))
+            bt_ready = audio.bt.capturing
+            current_mode = desired_mode if (desired_mode in ("bt", "mix") and bt_ready) else "mic"
+            audio.select(current_mode)
+
+            # opóźnienie A2DP: większość pokrywa linia opóźniająca na audio BT,
+            # resztę (transmisja do ESP32) pts klatki w LedSender
+            av_delay = 0.0
+            if current_mode == "bt":
+                d_ms = audio.bt.delay_auto_ms if params.bt_delay_auto else None
+                av_delay = (params.bt_delay_ms if d_ms is None else d_ms) / 1000.0
+            audio.bt_delay = int(max(0.0, av_delay - led_sender.tx_s - LED_LEAD_S) * SR)
+
+            if now - t_lat_pub >= LAT_PUBLISH_S:
+                t_lat_pub = now
+                lat = LATENCY.percentiles()
+                try:
+                    p50, p95, p99 = lat.get("total", (0.0, 0.0, 0.0))
+                    SHARED.publish({
+                        "lat_p50": round(p50, 1),
+                        "lat_p95": round(p95, 1),
+                        "lat_p99": round(p99, 1),
+                        "lat_stages": LATENCY.summary(lat),
+                    })
+                except Exception as e:
+                    log_exc("SHARED.publish(latency)", e)
+                if now - t_lat_log >= LAT_LOG_S and lat:
+                    t_lat_log = now
+                    print(f"[LAT] ms p50/p95/p99: {LATENCY.summary(lat)} | "
+                          f"led sent={led_sender.sent} dup={led_sender.suppressed} late={led_sender.late}")
+                    for k in profiler.flagged():
+                        r = profiler.report()[k]
+                        print(f"[FX] {k} over budget: p50={r['p50']:.1f} p95={r['p95']:.1f} "
+                              f"max={r['max']:.1f}ms over={r['over']:.0%} level={r['level']}")
 
             if now - t_lcd >= dt_lcd:
                 t_lcd = now
-                try:
-                    ui.set_mode(current_mode)
-                    ui.set_effect(effect_name)
-                    ui.set_visual_params(intensity=params["intensity"], color_mode=params["color_mode"])
-                    ui.set_audio_params(gain=params["gain"], smoothing=params["smoothing"])
-                    ui.set_mic_feats(
-                        rms=float(last_feats.get("rms", 0.0)),
-                        bass=float(last_feats.get("bass", 0.0)),
-                        mid=float(last_feats.get("mid", 0.0)),
-                        treble=float(last_feats.get("treble", 0.0)),
-                    )
-
-                    if current_mode == "bt":
-                        ui.set_bt(
-                            connected=bt_ready,
-                            device_name=str(st.get("device_name", "")),
-                            device_addr=str(bt_addr or ""),
-                        )
-
-                        artist = str(st.get("artist", "") or "")
-                        title  = str(st.get("title", "") or "")
-                        album  = str(st.get("album", "") or "")
-
-                        if meta is not None and (not artist and not title):
-                            ms = meta.snapshot()
-                            artist = ms.get("artist", "") or artist
-                            title  = ms.get("title", "") or title
-                            album  = ms.get("album", "") or album
-
-                        ui.set_track(artist=artist, title=title, album=album)
-
-                        if bt_ready:
-                            ui.set_status(f"bt(a2dp) | gain={params['gain']:.2f}")
-                        else:
-                            ui.set_status(f"bt(wait) | gain={params['gain']:.2f}")
-                    else:
-                        ui.set_status(f"mic | gain={params['gain']:.2f}")
+                ui_state = {
+                    "mode": current_mode,
+                    "effect": effect_name,
+                    "intensity": params.intensity,
+                    "color_mode": params.color_mode,
+                    "gain": params.gain,
+                    "smoothing": params.smoothing,
+                    "rms": float(last_feats.get("rms", 0.0)),
+                    "bass": float(last_feats.get("bass", 0.0)),
+                    "mid": float(last_feats.get("mid", 0.0)),
+                    "treble": float(last_feats.get("treble", 0.0)),
+                    # kopia: efekty potrafią zerować bands in-place
+                    "bands": np.array(last_feats.get("bands", np.zeros(16)), dtype=np.float32),
+                    "frame": last_frame,
+                }
+
+                if current_mode == "bt":
+                    ui_state["bt"] = {
+                        "connected": bt_ready,
+                        "device_name": str(st.get("device_name", "")),
+                        "device_addr": str(bt_addr or ""),
+                    }
+
+                    artist = str(st.get("artist", "") or "")
+                    title  = str(st.get("title", "") or "")
+                    album  = str(st.get("album", "") or "")
+                    ms = meta.snapshot() if meta is not None else {}
+                    if not artist and not title:
+                        artist = ms.get("artist", "") or artist
+                        title  = ms.get("title", "") or title
+                        album  = ms.get("album", "") or album
+
+                    # bez powiązanego MediaPlayer1 (telefon bez AVRCP) nie wiemy nic o pauzie
+                    bt_paused = bool(ms.get("connected")) and ms.get("status") in ("paused", "stopped")
+
+                    ui_state["track"] = {
+                        "artist": artist,
+                        "title": title,
+                        "album": album,
+                        "cover_url": ms.get("cover_url", "") or "",
+                        "position_ms": int(ms.get("position_ms", 0)),
+                        "duration_ms": int(ms.get("duration_ms", 0)),
+                        "playing": bool(ms.get("is_playing", False)),
+                    }
+
+                    src = "bt(a2dp)" if audio.bt.streaming else "bt(wait)"
+                else:
+                    src = f"mix {mixer.lag_ms:.0f}ms" if current_mode == "mix" else "mic"
+                    bt_paused = False
+                if idle.idle:
+                    src += " idle"
+                ui_state["status"] = f"{src} | gain={params.gain:.2f} | {lcd.fps:.0f}fps"
 
-                    ui.render()
-                except Exception as e:
-                    log_exc("LCDUI.render()", e)
+                ui_state["page"] = params.lcd_page
+                if params.lcd_page == "debug":
+                    ui_state["debug"] = debug_lines(LATENCY.percentiles(), led_sender, ui, audio, idle, profiler)
 
-            x = audio.get_latest(current_mode)
-            x = x - float(np.mean(x))
-            x = x * float(params["gain"])
+                lcd.submit(ui_state)
 
-            try:
-                feats = fe.compute(x, smoothing=params.get("smoothing", 0.65))
-                feats = sanitize_feats(feats)
-                last_feats = feats
-            except Exception as e:
-                log_exc("FeatureExtractor.compute()", e)
+                # dla BLE notify: zaokrąglone, żeby drobne wahania nie generowały pakietów
+                try:
+                    live = {
+                        "rms": round(ui_state["rms"], 3),
+                        "bass": round(ui_state["bass"], 2),
+                        "mid": round(ui_state["mid"], 2),
+                        "treble": round(ui_state["treble"], 2),
+                    }
+                    if meta is not None:
+                        ms = meta.snapshot()
+                        live["meta_connected"] = bool(ms.get("connected", False))
+                        live["meta_artist"] = ms.get("artist", "") or ""
+                        live["meta_title"] = ms.get("title", "") or ""
+                        live["meta_album"] = ms.get("album", "") or ""
+                    SHARED.publish(live)
+                except Exception as e:
+                    log_exc("SHARED.publish()", e)
+
+            was_idle = idle.idle
+            if was_idle:
+                # w idle tylko tani RMS; FFT dopiero, gdy coś zagra
+                rms = 0.0
+                for name in (("mic", "bt") if current_mode == "mix" else (current_mode,)):
+                    x = dc_gain(audio.get_latest(name, out=xbuf), params.gain)
+                    rms = max(rms, float(np.sqrt(np.mean(x * x))))
+                woke = not idle.update(now, rms, paused=bt_paused, poke=client_write)
+            else:
+                woke = True
+
+            # pętla kręci się co 1 ms, blok przychodzi co ~23 ms: analiza (flux/beat, SPECTRUM,
+            # idle) tylko dla nowego bloku, powtórka dawałaby flux 0 i rozjeżdżała próg beatu
+            t_blk = audio.capture_time("mic" if current_mode == "mix" else current_mode)
+            fresh = t_blk != t_analyzed
+            if woke and not fresh and (client_write or (now - t_blk) > BLOCK_STALE_S):
+                idle.update(now, 0.0, paused=bt_paused, poke=client_write)
+
+            if woke and fresh:
+                t_analyzed = t_blk
+                try:
+                    feats = sanitize_feats(analyze(current_mode, xbuf))
+                    t_audio = audio.t_block
+                    t_feats = time.monotonic()
+                    prev_src, a = audio.fade()
+                    if prev_src is not None:
+                        feats = blend_feats(sanitize_feats(analyze(prev_src, xbuf_prev)), feats, a)
+                    last_feats = feats
+                    SPECTRUM.push(feats["bands"], feats["rms"], feats.get("beat", False))
+                    idle.update(now, feats["rms"], beat=feats.get("beat", False), paused=bt_paused, poke=client_write)
+                except Exception as e:
+                    log_exc("FeatureExtractor.compute()", e)
+
+            if idle.idle != was_idle:
+                if idle.idle:
+                    last_feats = dict(quiet_feats)
+                    dt_led = 1.0 / FPS_LED_IDLE
+                    dt_lcd = 1.0 / FPS_LCD_IDLE
+                else:
+                    # pobudka: następna klatka LED/LCD od razu
+                    dt_led = 1.0 / FPS_LED
+                    dt_lcd = 1.0 / FPS_LCD
+                    t_led = t_lcd = 0.0
 
             if now - t_led >= dt_led:
                 t_led = now
-                frame = safe_update_effect(effect, last_feats, dt_led, params, effect_name)
+                frame = safe_update_effect(effect, last_feats, dt_led, params, effect_name, profiler)
                 try:
                     if frame is None or len(frame) != NUM_LEDS:
                         frame = [(0, 0, 0)] * NUM_LEDS
@@ -484,9 +782,15 @@ def main():
                     log_exc("frame.sanitize", e)
                     frame = [(0, 0, 0)] * NUM_LEDS
 
-                led_sender.submit(frame)
+                # identyczne klatki odsiewa LedSender (nie idą na serial)
+                last_frame = frame
+                led_sender.submit(
+                    frame,
+                    pts=(t_audio + av_delay) if av_delay > 0 else None,
+                    stamps=(t_audio, t_feats, time.monotonic()),
+                )
 
-            time.sleep(0.001)
+            time.sleep(IDLE_SLEEP if idle.idle else 0.001)
 
     except KeyboardInterrupt:
         pass
@@ -504,6 +808,11 @@ def main():
             leds.close()
         except Exception:
             pass
+        try:
+            lcd.stop()
+            lcd.join(timeout=1.0)
+        except Exception:
+            pass
         try:
             ui.close()
         except Exception:
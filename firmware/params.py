@@ -0,0 +1,195 @@
+# firmware/params.py
+# Parameter registry: type, range, default and owner of every state / effect
+# parameter in one place.
+#
+# - SharedState validates BLE writes with it (once, at write time)
+# - the GATT server exposes the schema (PARAMS characteristic) and the binary
+#   protocol takes its field ids from here
+# - effects get a resolved Params object (attributes, already typed/clamped)
+
+import math
+
+EFFECT_NAMES = ("bars", "osc", "pulse", "fire", "plasma", "spiral", "ripple", "kaleidoscope")
+
+
+class Param:
+    __slots__ = ("name", "fid", "kind", "default", "lo", "hi", "choices", "maxlen", "owner", "device")
+
+    def __init__(self, name, fid, kind, default, lo=None, hi=None, choices=None, maxlen=64, owner=None, device=False):
+        self.name = name
+        self.fid = fid          # id w protokole binarnym (None = nie do zapisu)
+        self.kind = kind        # "float" | "int" | "bool" | "choice" | "str"
+        self.default = default
+        self.lo = lo
+        self.hi = hi
+        self.choices = choices
+        self.maxlen = maxlen
+        self.owner = owner      # None = globalny, inaczej nazwa efektu
+        self.device = device    # ustawiany tylko przez urządzenie (publish)
+
+    def validate(self, v):
+        k = self.kind
+        if k in ("float", "int"):
+            x = float(v)
+            if not math.isfinite(x):
+                raise ValueError(f"{self.name}: not finite")
+            if self.lo is not None:
+                x = max(self.lo, x)
+            if self.hi is not None:
+                x = min(self.hi, x)
+            return int(round(x)) if k == "int" else x
+        if k == "bool":
+            if isinstance(v, str):
+                return v.strip().lower() in ("1", "true", "yes", "on")
+            return bool(v)
+        if k == "choice":
+            x = str(v).strip().lower()
+            if x not in self.choices:
+                raise ValueError(f"{self.name}: expected one of {self.choices}")
+            return x
+        return ("" if v is None else str(v)).strip()[: self.maxlen]
+
+    def describe(self) -> dict:
+        d = {"k": self.name, "t": self.kind, "def": self.default}
+        if self.fid is not None:
+            d["id"] = self.fid
+        if self.lo is not None:
+            d["min"] = self.lo
+        if self.hi is not None:
+            d["max"] = self.hi
+        if self.choices:
+            d["opts"] = list(self.choices)
+        if self.owner:
+            d["fx"] = self.owner
+        if self.device:
+            d["ro"] = True
+        return d
+
+
+def _f(name, fid, default, lo, hi, owner=None):
+    return Param(name, fid, "float", default, lo=lo, hi=hi, owner=owner)
+
+
+PARAMS = [
+    # globalne
+    Param("mode", 1, "choice", "mic", choices=("mic", "bt", "mix")),
+    Param("effect", 2, "choice", "bars", choices=EFFECT_NAMES),
+    _f("brightness", 3, 0.55, 0.0, 1.0),
+    _f("intensity", 4, 0.75, 0.0, 1.0),
+    _f("gain", 5, 1.0, 0.05, 6.0),
+    _f("smoothing", 6, 0.65, 0.0, 0.95),
+    Param("color_mode", 7, "choice", "auto", choices=("auto", "rainbow", "mono")),
+    _f("power", 14, 0.55, 0.0, 1.0),
+    _f("glow", 15, 0.25, 0.0, 1.0),
+    Param("spectrum_hz", 25, "int", 20, lo=10, hi=30),
+    # opóźnienie A2DP -> głośniki; LED-y w trybie bt są opóźniane o tyle
+    Param("bt_delay_ms", 26, "int", 0, lo=0, hi=1000),
+    Param("bt_delay_auto", 27, "bool", False),
+    Param("lcd_page", 28, "choice", "main", choices=("main", "debug")),
+    Param("fx_autodegrade", 29, "bool", True),
+
+    # metadata (apka może wysyłać)
+    Param("device_addr", 8, "str", "", maxlen=17),
+    Param("device_name", 9, "str", "", maxlen=64),
+    Param("artist", 10, "str", "", maxlen=160),
+    Param("title", 11, "str", "", maxlen=160),
+    Param("album", 12, "str", "", maxlen=160),
+    Param("connected", 13, "bool", False),
+
+    # bars
+    _f("bars_gauss", 16, 0.55, 0.0, 1.0, owner="bars"),
+
+    # ripple
+    _f("ripple_cooldown", 17, 0.10, 0.02, 2.0, owner="ripple"),
+    _f("ripple_min_bass", 18, 0.18, 0.0, 1.0, owner="ripple"),
+    _f("ripple_delta", 19, 0.06, 0.0, 1.0, owner="ripple"),
+    _f("ripple_beat_th", 20, 0.28, 0.0, 2.0, owner="ripple"),
+    _f("ripple_ttl", 21, 2.2, 0.2, 6.0, owner="ripple"),
+    _f("ripple_speed", 22, 10.5, 1.0, 40.0, owner="ripple"),
+    _f("ripple_width", 23, 2.3, 0.5, 8.0, owner="ripple"),
+    _f("ripple_gauss", 24, 0.55, 0.05, 4.0, owner="ripple"),
+
+    # live z urządzenia (features + AVRCP)
+    Param("rms", None, "float", 0.0, device=True),
+    Param("bass", None, "float", 0.0, device=True),
+    Param("mid", None, "float", 0.0, device=True),
+    Param("treble", None, "float", 0.0, device=True),
+    Param("meta_connected", None, "bool", False, device=True),
+    Param("meta_artist", None, "str", "", maxlen=160, device=True),
+    Param("meta_title", None, "str", "", maxlen=160, device=True),
+    Param("meta_album", None, "str", "", maxlen=160, device=True),
+
+    # opóźnienie capture -> LED (firmware/latency.py), ms
+    Param("lat_p50", None, "float", 0.0, device=True),
+    Param("lat_p95", None, "float", 0.0, device=True),
+    Param("lat_p99", None, "float", 0.0, device=True),
+    Param("lat_stages", None, "str", "", maxlen=160, device=True),
+]
+
+BY_NAME = {p.name: p for p in PARAMS}
+BY_FID = {p.fid: p for p in PARAMS if p.fid is not None}
+DEVICE_KEYS = tuple(p.name for p in PARAMS if p.device)
+CLIENT_KEYS = tuple(p.name for p in PARAMS if not p.device)
+
+
+def defaults() -> dict:
+    return {p.name: p.default for p in PARAMS}
+
+
+def validate(name: str, v):
+    """Typed, clamped value; KeyError for unknown names, ValueError for bad values."""
+    return BY_NAME[name].validate(v)
+
+
+def schema(owner=None) -> list:
+    """Descriptions of all parameters, or only of one effect (owner=name)."""
+    return [p.describe() for p in PARAMS if owner is None or p.owner == owner]
+
+
+class Params:
+    """
+    Resolved parameters as attributes (p.intensity, p.ripple_speed, ...).
+    Build it when the state changes, not per frame. get() is kept for old
+    call sites that still treat params as a dict.
+    """
+    def __init__(self, values: dict):
+        self.__dict__.update(values)
+
+    def get(self, name, default=None):
+        return self.__dict__.get(name, default)
+
+    def __getitem__(self, name):
+        return self.__dict__[name]
+
+
+def resolve(values: dict) -> Params:
+    """values must already be validated (e.g. SharedState); missing -> defaults."""
+    d = defaults()
+    for k, v in values.items():
+        if k in d:
+            d[k] = v
+    return Params(d)
+
+
+_DEFAULT_PARAMS = None
+
+
+def as_params(params) -> Params:
+    """Params as is; None -> defaults; a plain dict is validated (slow path, tools)."""
+    global _DEFAULT_PARAMS
+    if isinstance(params, Params):
+        return params
+    if not params:
+        if _DEFAULT_PARAMS is None:
+            _DEFAULT_PARAMS = Params(defaults())
+        return _DEFAULT_PARAMS
+    d = defaults()
+    for k, v in params.items():
+        p = BY_NAME.get(k)
+        if p is None:
+            continue
+        try:
+            d[k] = p.validate(v)
+        except Exception:
+            pass
+    return Params(d)
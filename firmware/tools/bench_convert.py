@@ -0,0 +1,42 @@
+# Benchmark: old int16 stereo -> mono chain vs firmware.audio.convert.
+# Run: python3 -m firmware.tools.bench_convert
+import timeit
+import numpy as np
+
+from firmware.audio.convert import to_mono, dc_gain
+
+N = 1024
+CH = 2
+GAIN = 1.7
+REPS = 20000
+
+raw = np.random.randint(-20000, 20000, N * CH, dtype=np.int16).tobytes()
+ring = np.frombuffer(raw, dtype=np.int16).copy()
+out = np.zeros(N, dtype=np.float32)
+xbuf = np.zeros(N, dtype=np.float32)
+
+
+def old_chain():
+    # BlueAlsaInput.read_mono_f32 + main.py (przed zmianą)
+    x = np.frombuffer(bytes(raw), dtype=np.int16).astype(np.float32) / 32768.0
+    x = x.reshape(N, CH).mean(axis=1)
+    if not np.isfinite(x).all():
+        x = np.zeros(N, dtype=np.float32)
+    x = x.copy()                      # AudioHub.get_latest
+    x = x - float(np.mean(x))
+    x = x * float(GAIN)
+    return x
+
+
+def new_chain():
+    to_mono(ring, out, CH)            # BlueAlsaInput._take
+    np.copyto(xbuf, out)              # AudioHub.get_latest(out=...)
+    return dc_gain(xbuf, GAIN)
+
+
+a, b = old_chain(), new_chain()
+assert np.allclose(a, b, atol=1e-6)
+
+for name, fn in (("old chain", old_chain), ("new chain", new_chain)):
+    t = min(timeit.repeat(fn, number=REPS, repeat=3)) / REPS
+    print(f"{name:14s} {t * 1e6:7.1f} us/block")
@@ -0,0 +1,256 @@
+# Headless benchmark of the whole render pipeline, no hardware needed:
+#   audio (synthetic or WAV, int16) -> to_mono/dc_gain -> FeatureExtractor
+#   -> every effect from make_effects() -> LED packing -> Esp32SerialDriver
+#   -> LCDUI (live pane every LED frame, full screen separately)
+# The drivers get the simulated firmware.hal backends (in-memory or pty
+# serial link, NullBus under LCDUI), so the real driver code runs but nothing
+# touches /dev/ttyUSB0, SPI or GPIO.
+#
+# Per matrix size it prints per-stage time (mean/p95), throughput, FPS
+# ceilings (CPU and the serial link) and memory allocated per frame
+# (tracemalloc: transient peak, and what stays allocated after the call -
+# for effects that includes the returned frame).
+# Effects that return no frame, a wrong-sized or an all-black one (most of
+# them catch their own errors and fall back to a blank frame, e.g. at sizes
+# they were not written for) are flagged, not given an FPS figure, and a
+# serial link slower than FPS_LED is called out; both are summarized at the end.
+#
+# Run: python3 -m firmware.tools.bench_pipeline [--wav song.wav] [--sizes 8x8,16x16,32x32]
+#                                               [--frames 300] [--serial mem|pty]
+import argparse
+import os
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from firmware.audio.convert import to_mono, dc_gain
+from firmware.audio.features import FeatureExtractor
+from firmware.effects import make_effects
+from firmware.hal.audio_in import load_wav, synth
+from firmware.hal.lcd_bus import NullBus
+from firmware.hal.serial_link import MemoryLink, PtyLink
+from firmware.led.esp32_serial_driver import Esp32SerialDriver
+from firmware.params import as_params
+from firmware.ui.lcd_ui import LCDUI
+
+SR = 44100
+NFFT = 1024
+BAUD = 115200
+FPS_LED = 20.0
+GAIN = 1.0
+SMOOTHING = 0.65
+
+
+# ---------- audio ----------
+
+def synth_audio(seconds=8.0, sr=SR, channels=2):
+    """firmware.hal.audio_in.synth as int16 interleaved (like from bluealsa)."""
+    x = synth(np.arange(int(seconds * sr)) / sr)
+    out = np.repeat((x * 30000).astype(np.int16)[:, None], channels, axis=1)
+    return out.ravel(), sr, channels
+
+
+def wav_audio(path: str):
+    x, sr = load_wav(path)
+    return (x * 32767.0).astype(np.int16).ravel(), sr, x.shape[1]
+
+
+def blocks(data: np.ndarray, ch: int, nfft: int):
+    step = nfft * ch
+    n = data.shape[0] // step
+    if n == 0:
+        raise SystemExit("audio shorter than one block")
+    i = 0
+    while True:
+        yield data[(i % n) * step : (i % n + 1) * step]
+        i += 1
+
+
+# ---------- pomiary ----------
+
+class Stage:
+    def __init__(self):
+        self.ns = []
+        self.peak = []
+        self.kept = []
+
+    def time(self, fn, *a):
+        t0 = time.perf_counter_ns()
+        r = fn(*a)
+        self.ns.append(time.perf_counter_ns() - t0)
+        return r
+
+    def trace(self, fn, *a):
+        cur0 = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        r = fn(*a)
+        cur1, peak = tracemalloc.get_traced_memory()
+        self.peak.append(peak - cur0)
+        self.kept.append(cur1 - cur0)
+        return r
+
+    def row(self, name: str) -> str:
+        us = np.asarray(self.ns, dtype=np.float64) / 1000.0
+        mean, p95 = float(us.mean()), float(np.percentile(us, 95))
+        peak = np.mean(self.peak) / 1024.0 if self.peak else 0.0
+        kept = np.mean(self.kept) if self.kept else 0.0
+        return f"  {name:18s} {mean:9.1f} {p95:9.1f} {1e6 / mean:10.0f} {peak:10.1f} {kept:9.0f}"
+
+    @property
+    def mean_s(self) -> float:
+        return float(np.mean(self.ns)) / 1e9
+
+
+def drain(path: str):
+    # druga strona pty: czyta wszystko jak ESP32
+    fd = os.open(path, os.O_RDONLY | os.O_NOCTTY)
+    while True:
+        try:
+            if not os.read(fd, 65536):
+                return
+        except OSError:
+            return
+
+
+def pack(frame) -> bytes:
+    # jak LedSender.run
+    return np.clip(np.asarray(frame, dtype=np.int32), 0, 255).astype(np.uint8).tobytes()
+
+
+def is_empty(frame, n: int) -> bool:
+    # None, zła długość albo sama czerń (syntetyczny sygnał zawsze coś gra)
+    return frame is None or len(frame) != n or not np.asarray(frame).any()
+
+
+def bench_size(w: int, h: int, audio, frames: int, serial_port: str) -> dict:
+    data, sr, ch = audio
+    params = as_params(None)
+    dt = 1.0 / FPS_LED
+
+    fe = FeatureExtractor(samplerate=sr, nfft=NFFT, bands=16, fmin=20, fmax=min(20000, sr // 2))
+    effects = make_effects(w, h)
+    if serial_port == "pty":
+        link = PtyLink()
+        threading.Thread(target=drain, args=(link.path,), daemon=True).start()
+    else:
+        link = MemoryLink()
+    leds = Esp32SerialDriver(num_leds=w * h, port=serial_port, baud=BAUD, link=link)
+    ui = LCDUI(led_w=w, led_h=h, bus=NullBus())
+    ui.set_mode("mic")
+
+    mono = np.zeros(NFFT, dtype=np.float32)
+    names = list(effects)
+    st = {k: Stage() for k in ["convert", "features"] + [f"fx:{n}" for n in names] +
+          ["pack", "serial", "lcd_live", "lcd_full"]}
+    empty = dict.fromkeys(names, 0)
+    checked = 0
+
+    def send(payload):
+        leds.set_frame(payload)
+        leds.show()
+
+    def audio_step(blk):
+        return dc_gain(to_mono(blk, mono, ch), GAIN)
+
+    def live(frame, bands):
+        ui.set_spectrum(bands)
+        ui.set_led_frame(frame)
+        ui.render_live()
+
+    def one(i, blk, measure, check=False):
+        nonlocal checked
+        x = measure(st["convert"], audio_step, blk)
+        feats = measure(st["features"], fe.compute, x, SMOOTHING)
+        out = {}
+        for n in names:
+            out[n] = measure(st[f"fx:{n}"], effects[n].update, feats, dt, params)
+            if check and is_empty(out[n], w * h):
+                empty[n] += 1
+        checked += check
+        # sink dostaje co klatkę inny efekt: najgorszy przypadek dla pomijania powtórek
+        frame = out[names[i % len(names)]]
+        payload = measure(st["pack"], pack, frame)
+        measure(st["serial"], send, payload)
+        measure(st["lcd_live"], live, frame, feats["bands"])
+        if i % 10 == 0:
+            ui.set_mic_feats(rms=feats["rms"], bass=feats["bass"], mid=feats["mid"], treble=feats["treble"])
+            measure(st["lcd_full"], ui.render)
+
+    src = blocks(data, ch, NFFT)
+    for i in range(20):   # rozgrzewka: cache glifów, chrome, stan efektów
+        one(i, next(src), lambda s, fn, *a: fn(*a))
+
+    for i in range(frames):
+        one(i, next(src), Stage.time, check=True)
+
+    tracemalloc.start()
+    try:
+        for i in range(max(20, frames // 5)):
+            one(i, next(src), Stage.trace)
+    finally:
+        tracemalloc.stop()
+
+    print(f"\n== {w}x{h} ({w * h} LEDs, {frames} frames, serial={serial_port}) ==")
+    print(f"  {'stage':18s} {'mean us':>9s} {'p95 us':>9s} {'ops/s':>10s} {'peak KiB':>10s} {'kept B':>9s}")
+    for k, s in st.items():
+        row = s.row(k)
+        n = k[3:] if k.startswith("fx:") else None
+        if n is not None and empty[n]:
+            row += f"  EMPTY {empty[n]}/{checked}"
+        print(row)
+
+    base = st["convert"].mean_s + st["features"].mean_s + st["pack"].mean_s + st["serial"].mean_s
+    print(f"  FPS ceiling (audio + fx + pack + serial write, CPU only; LCD live adds "
+          f"{st['lcd_live'].mean_s * 1e3:.2f} ms/frame):")
+    broken = [n for n in names if empty[n] == checked]
+    for n in names:
+        if n in broken:
+            print(f"    {n:14s}      n/a  (no frames at {w}x{h}, timing is of the error path)")
+            continue
+        cpu = base + st[f"fx:{n}"].mean_s
+        note = f", {empty[n]}/{checked} frames empty" if empty[n] else ""
+        print(f"    {n:14s} {1.0 / cpu:8.0f} fps  ({cpu * 1e3:.2f} ms{note})")
+    serial_fps = 1.0 / leds.tx_s
+    print(f"  serial link: {leds.tx_s * 1e3:.1f} ms/frame at {BAUD} baud -> {serial_fps:.1f} fps max")
+    if serial_fps < FPS_LED:
+        print(f"  !! serial link caps LED output at {serial_fps:.1f} fps, below FPS_LED = {FPS_LED:.0f} "
+              f"(needs >= {BAUD * FPS_LED / serial_fps:.0f} baud)")
+    print(f"  LCD: live {1.0 / st['lcd_live'].mean_s:.0f} fps, full {1.0 / st['lcd_full'].mean_s:.0f} fps, "
+          f"SPI {ui.bus.bytes / max(1, ui.bus.writes):.0f} B/write, pushed={ui.pushed} skipped={ui.suppressed}")
+
+    ui.close()
+    leds.close()
+    return {"broken": broken, "partial": [n for n in names if 0 < empty[n] < checked], "serial_fps": serial_fps}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline benchmark of the audio -> LED/LCD pipeline")
+    ap.add_argument("--wav", help="16-bit PCM WAV instead of the synthetic signal")
+    ap.add_argument("--sizes", default="8x8,16x16,32x32", help="matrix sizes, WxH comma separated")
+    ap.add_argument("--frames", type=int, default=300)
+    ap.add_argument("--serial", choices=("mem", "pty"), default="mem")
+    a = ap.parse_args()
+
+    audio = wav_audio(a.wav) if a.wav else synth_audio()
+    print(f"audio: {'synthetic' if not a.wav else a.wav}, {audio[1]} Hz, {audio[2]} ch, block {NFFT}")
+    res = {}
+    for size in a.sizes.split(","):
+        w, h = (int(v) for v in size.lower().split("x"))
+        res[f"{w}x{h}"] = bench_size(w, h, audio, a.frames, a.serial)
+
+    print("\n== summary ==")
+    for size, r in res.items():
+        issues = []
+        if r["serial_fps"] < FPS_LED:
+            issues.append(f"serial capped at {r['serial_fps']:.1f} fps < FPS_LED {FPS_LED:.0f}")
+        if r["broken"]:
+            issues.append("no frames: " + ", ".join(r["broken"]))
+        if r["partial"]:
+            issues.append("some empty frames: " + ", ".join(r["partial"]))
+        print(f"  {size:8s} " + ("; ".join(issues) if issues else "ok"))
+
+
+if __name__ == "__main__":
+    main()
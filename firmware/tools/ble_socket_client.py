@@ -0,0 +1,56 @@
+# Client for the BLE socket stand-in (firmware/hal/ble_socket.py), e.g. against
+#   VIS_HAL=sim python3 -u -m firmware.main
+# Sends one JSON patch (optional) and prints what comes back for a while.
+# Run: python3 -m firmware.tools.ble_socket_client '{"effect": "plasma"}' [seconds]
+import json
+import os
+import socket
+import sys
+import time
+
+from firmware import hal
+from firmware.bt import ctrl_proto as proto
+from firmware.hal.ble_socket import (
+    CHR_ACK, CHR_CMD, CHR_PARAMS, CHR_SPECTRUM, CHR_STATE,
+    OP_NOTIFY, OP_READ, OP_VALUE, OP_WRITE, frame, unframe,
+)
+
+NAMES = {CHR_CMD: "CMD", CHR_STATE: "STATE", CHR_ACK: "ACK", CHR_PARAMS: "PARAMS", CHR_SPECTRUM: "SPECTRUM"}
+
+path = os.environ.get("VIS_BLE_SOCKET") or hal.BLE_SOCKET
+patch = json.loads(sys.argv[1]) if len(sys.argv) > 1 else None
+secs = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+
+s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+s.connect(path)
+s.sendall(frame(OP_READ, CHR_STATE))
+if patch and all(k in proto.FIELD_IDS for k in patch):
+    # binarnie (z seq -> ACK), jak aplikacja
+    s.sendall(frame(OP_WRITE, CHR_CMD, proto.encode(1, patch)))
+elif patch:
+    s.sendall(frame(OP_WRITE, CHR_CMD, json.dumps(patch).encode("utf-8")))
+
+buf = bytearray()
+spectra = 0
+t_end = time.monotonic() + secs
+s.settimeout(0.2)
+while time.monotonic() < t_end:
+    try:
+        data = s.recv(4096)
+    except socket.timeout:
+        continue
+    if not data:
+        break
+    buf += data
+    for op, chr_id, payload in unframe(buf):
+        name = NAMES.get(chr_id, chr_id)
+        if chr_id == CHR_SPECTRUM:
+            spectra += 1
+            continue
+        if chr_id == CHR_ACK:
+            print(f"{name}: {payload.hex()}")
+        else:
+            kind = "value" if op == OP_VALUE else ("notify" if op == OP_NOTIFY else op)
+            print(f"{name} {kind}: {payload[:200].decode('utf-8', 'replace')}")
+print(f"SPECTRUM packets: {spectra} in {secs:.0f} s")
+s.close()
@@ -0,0 +1,108 @@
+import io
+import os
+import queue
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from firmware.ui.glyph_cache import rgb565
+
+
+class CoverArtCache:
+    """
+    Album art for the now-playing screen.
+
+    request(url) queues the cover for a background worker that opens it
+    (bluez/obexd BIP file path, file:// or http(s)), decodes it at reduced
+    size and stores a ready-to-blit RGB565 tile. get(url) never decodes,
+    it only returns what the worker has finished (or None).
+    """
+    def __init__(self, size=64, max_items=16, dim=1.0, retry_s=30.0):
+        self.size = int(size)
+        self.max_items = int(max_items)
+        self.dim = float(dim)
+        self.retry_s = float(retry_s)
+
+        self._lock = threading.Lock()
+        self._tiles: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._pending: set = set()
+        self._failed: dict = {}
+
+        self._q: "queue.Queue[str | None]" = queue.Queue()
+        self._thread: threading.Thread | None = None
+
+    def get(self, url: str):
+        if not url:
+            return None
+        with self._lock:
+            tile = self._tiles.get(url)
+            if tile is not None:
+                self._tiles.move_to_end(url)
+            return tile
+
+    def request(self, url: str):
+        if not url:
+            return
+        with self._lock:
+            if url in self._tiles or url in self._pending:
+                return
+            t_fail = self._failed.get(url)
+            if t_fail is not None and (time.monotonic() - t_fail) < self.retry_s:
+                return
+            self._pending.add(url)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._q.put(url)
+
+    def close(self):
+        self._q.put(None)
+
+    def _run(self):
+        while True:
+            url = self._q.get()
+            if url is None:
+                return
+            try:
+                tile = self._load(url)
+            except Exception:
+                tile = None
+            with self._lock:
+                self._pending.discard(url)
+                if tile is None:
+                    self._failed[url] = time.monotonic()
+                    continue
+                self._failed.pop(url, None)
+                self._tiles[url] = tile
+                self._tiles.move_to_end(url)
+                while len(self._tiles) > self.max_items:
+                    self._tiles.popitem(last=False)
+
+    @staticmethod
+    def _open(url: str):
+        u = urllib.parse.urlparse(url)
+        if u.scheme in ("http", "https"):
+            with urllib.request.urlopen(url, timeout=3.0) as r:
+                return Image.open(io.BytesIO(r.read()))
+        path = urllib.parse.unquote(u.path) if u.scheme == "file" else url
+        if not os.path.isfile(path):
+            return None
+        return Image.open(path)
+
+    def _load(self, url: str):
+        img = self._open(url)
+        if img is None:
+            return None
+        with img:
+            # JPEG: dekodowanie od razu w mniejszej skali (DCT), dużo taniej niż pełne + resize
+            img.draft("RGB", (self.size * 2, self.size * 2))
+            img = ImageOps.fit(img.convert("RGB"), (self.size, self.size), method=Image.BILINEAR)
+        rgb = np.asarray(img, dtype=np.float32) * self.dim
+        tile = rgb565(np.clip(rgb, 0, 255).astype(np.uint8))
+        tile.setflags(write=False)
+        return tile
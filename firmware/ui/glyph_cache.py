@@ -0,0 +1,113 @@
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+def rgb565(rgb: np.ndarray) -> np.ndarray:
+    r = rgb[..., 0].astype(np.uint16)
+    g = rgb[..., 1].astype(np.uint16)
+    b = rgb[..., 2].astype(np.uint16)
+    return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+
+
+class GlyphCache:
+    """
+    Pre-rendered RGB565 text tiles, blitted straight into a uint16 frame buffer.
+
+    - draw():   whole-string tiles (labels, track names), LRU bounded
+    - glyphs(): per-character tiles for monospaced fonts, so changing numbers
+                are just a few cached digit blits instead of a FreeType pass
+    Tiles are rendered on black and blitted with a mask (only lit pixels).
+    """
+    def __init__(self, max_strings=256):
+        self.max_strings = int(max_strings)
+        self._strings: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._glyphs: dict = {}
+        self._mono: dict = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _raster(text: str, font, color, size=None):
+        if size is None:
+            x0, y0, x1, y1 = font.getbbox(text)
+            size = (max(1, int(x1)), max(1, int(y1)))
+        img = Image.new("RGB", size, (0, 0, 0))
+        ImageDraw.Draw(img).text((0, 0), text, fill=tuple(color), font=font)
+        rgb = np.asarray(img)
+        tile = rgb565(rgb)
+        mask = rgb.any(axis=2)
+        return tile, mask
+
+    def _advance(self, font):
+        adv = self._mono.get(font)
+        if adv is None:
+            # 0 = font nie jest monospace -> glyphs() spada do draw()
+            try:
+                a, b = font.getlength("i"), font.getlength("W")
+                adv = int(round(a)) if abs(a - b) < 0.01 else 0
+            except Exception:
+                adv = 0
+            self._mono[font] = adv
+        return adv
+
+    @staticmethod
+    def _blit(px: np.ndarray, x: int, y: int, tile: np.ndarray, mask: np.ndarray):
+        h, w = tile.shape
+        H, W = px.shape
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(W, x + w), min(H, y + h)
+        if x1 <= x0 or y1 <= y0:
+            return
+        sub = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+        np.copyto(px[y0:y1, x0:x1], tile[sub], where=mask[sub])
+
+    def string_tile(self, text: str, font, color):
+        key = (font, text, tuple(color))
+        t = self._strings.get(key)
+        if t is not None:
+            self._strings.move_to_end(key)
+            self.hits += 1
+            return t
+        self.misses += 1
+        t = self._raster(text, font, color)
+        self._strings[key] = t
+        if len(self._strings) > self.max_strings:
+            self._strings.popitem(last=False)
+        return t
+
+    def draw(self, px: np.ndarray, xy, text: str, font, color):
+        if not text:
+            return
+        tile, mask = self.string_tile(text, font, color)
+        self._blit(px, int(xy[0]), int(xy[1]), tile, mask)
+
+    def glyphs(self, px: np.ndarray, xy, text: str, font, color):
+        if not text:
+            return
+        adv = self._advance(font)
+        if adv <= 0:
+            self.draw(px, xy, text, font, color)
+            return
+
+        x, y = int(xy[0]), int(xy[1])
+        color = tuple(color)
+        for ch in text:
+            key = (font, ch, color)
+            t = self._glyphs.get(key)
+            if t is None:
+                self.misses += 1
+                asc, desc = font.getmetrics()
+                t = self._raster(ch, font, color, size=(adv, asc + desc))
+                self._glyphs[key] = t
+            else:
+                self.hits += 1
+            if ch != " ":
+                self._blit(px, x, y, t[0], t[1])
+            x += adv
+
+    def clear(self):
+        self._strings.clear()
+        self._glyphs.clear()
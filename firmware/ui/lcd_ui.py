@@ -1,9 +1,11 @@
 import time
-import spidev
-import lgpio
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont, ImageOps
-from typing import Optional
+from PIL import Image, ImageDraw, ImageFont
+
+from firmware import hal, params
+from firmware.ui.glyph_cache import GlyphCache, rgb565
+from firmware.ui.cover_art import CoverArtCache
+from firmware.ui.marquee import Marquee
 
 
 class LCDUI:
@@ -27,6 +29,10 @@ class LCDUI:
         accent=(30, 140, 255),
         bg=(0, 0, 0),
         dim=0.90,
+        led_w=16,
+        led_h=16,
+        preview_gain=3.0,
+        bus=None,
     ):
         self.spi_bus = int(spi_bus)
         self.spi_dev = int(spi_dev)
@@ -36,7 +42,8 @@ class LCDUI:
         self.RST = int(rst)
         self.CS = None if cs_gpio is None else int(cs_gpio)
 
-        self.rotate = int(rotate) % 360
+        # obrót w krokach 90° (robiony w numpy, nie w PIL)
+        self.rotate = (int(rotate) // 90 * 90) % 360
         self.mirror = bool(mirror)
         self.panel_invert = bool(panel_invert)
 
@@ -63,6 +70,8 @@ class LCDUI:
         self.treble = 0.0
 
         self.status = ""
+        self.page = "main"      # "debug": opóźnienia i liczniki zamiast zwykłego ekranu
+        self.debug = []
         self.bt_name = ""
         self.bt_addr = ""
         self.bt_connected = False
@@ -70,7 +79,22 @@ class LCDUI:
         self.title = ""
         self.album = ""
 
-        self._cover_cache: Optional[Image.Image] = None
+        self.cover_url = ""
+        self.position_ms = 0
+        self.duration_ms = 0
+        self.playing = False
+        self.COVER = (236, 86)  # lewy górny róg okładki (logicznie)
+        self.covers = CoverArtCache(size=64, dim=self.dim)
+
+        # live pane (spektrum + podgląd matrycy LED), odświeżany osobno od reszty ekranu
+        self.led_w = int(led_w)
+        self.led_h = int(led_h)
+        self.preview_gain = float(preview_gain)
+        self.spectrum = np.zeros(16, dtype=np.float32)
+        self.led_preview = np.zeros((self.led_h, self.led_w, 3), dtype=np.uint8)
+
+        self.PANE = (150, 106, 301, 169)  # x0, y0, x1, y1 (logicznie, 320x240)
+        self._pane_setup()
 
         try:
             self.font = ImageFont.truetype(font_path, font_size)
@@ -81,16 +105,27 @@ class LCDUI:
             self.font_big = ImageFont.load_default()
             self.font_small = ImageFont.load_default()
 
-        self.gh = lgpio.gpiochip_open(0)
-        lgpio.gpio_claim_output(self.gh, self.DC, 0)
-        lgpio.gpio_claim_output(self.gh, self.RST, 1)
-        if self.CS is not None:
-            lgpio.gpio_claim_output(self.gh, self.CS, 1)
+        self.glyphs = GlyphCache()
+        self._chrome_cache: dict = {}
+        try:
+            self._adv_small = max(1, int(round(self.font_small.getlength("0"))))
+        except Exception:
+            self._adv_small = 6
+        self._marquee_setup()
+
+        # GPIO + SPI panelu; bez podanego: firmware.hal (VIS_LCD_BACKEND: spi / png / null)
+        self.bus = bus if bus is not None else hal.open_lcd_bus(
+            spi_bus=self.spi_bus, spi_dev=self.spi_dev, spi_hz=self.spi_hz,
+            dc=self.DC, rst=self.RST, cs=self.CS, size=(self.WP, self.HP),
+            rotate=self.rotate, mirror=self.mirror,
+        )
 
-        self.spi = spidev.SpiDev()
-        self.spi.open(self.spi_bus, self.spi_dev)
-        self.spi.max_speed_hz = self.spi_hz
-        self.spi.mode = 0
+        # to, co aktualnie jest na panelu (pomijanie identycznych okien SPI)
+        self._shadow = np.zeros((self.HP, self.WP), dtype=np.uint16)
+        self._shadow_ok = False
+        self.pushed = 0
+        self.suppressed = 0
+        self.px_pushed = 0
 
         self._init_st7789()
         self._fill_black()
@@ -101,38 +136,19 @@ class LCDUI:
     def set_effect(self, effect: str):
         self.effect = (effect or "")[:12]
 
-    def set_visual_params(self, *, intensity: float, color_mode: str = "auto"):
+    def _param(self, name, v, current):
         try:
-            x = float(intensity)
+            return params.validate(name, v)
         except Exception:
-            x = self.intensity
-        if x < 0.0:
-            x = 0.0
-        if x > 1.0:
-            x = 1.0
-        self.intensity = x
-
-        cm = str(color_mode or "auto").lower()
-        if cm not in ("auto", "rainbow", "mono"):
-            cm = "auto"
-        self.color_mode = cm
+            return current
 
-    def set_audio_params(self, *, gain: float, smoothing: float):
-        try:
-            g = float(gain)
-        except Exception:
-            g = self.gain
-        if not np.isfinite(g):
-            g = self.gain
-        self.gain = max(0.1, min(6.0, g))
+    def set_visual_params(self, *, intensity: float, color_mode: str = "auto"):
+        self.intensity = self._param("intensity", intensity, self.intensity)
+        self.color_mode = self._param("color_mode", color_mode, "auto")
 
-        try:
-            s = float(smoothing)
-        except Exception:
-            s = self.smoothing
-        if not np.isfinite(s):
-            s = self.smoothing
-        self.smoothing = max(0.0, min(0.95, s))
+    def set_audio_params(self, *, gain: float, smoothing: float):
+        self.gain = self._param("gain", gain, self.gain)
+        self.smoothing = self._param("smoothing", smoothing, self.smoothing)
 
     def set_mic_feats(self, *, rms: float, bass: float, mid: float, treble: float):
         self.rms = float(rms)
@@ -140,31 +156,62 @@ class LCDUI:
         self.mid = float(mid)
         self.treble = float(treble)
 
+    def set_spectrum(self, bands):
+        b = np.asarray(bands, dtype=np.float32)
+        if b.shape[0] != self.spectrum.shape[0]:
+            xi = np.linspace(0, b.shape[0] - 1, self.spectrum.shape[0])
+            b = np.interp(xi, np.arange(b.shape[0]), b)
+        self.spectrum = np.clip(np.nan_to_num(b, nan=0.0), 0.0, 1.0).astype(np.float32)
+
+    def set_led_frame(self, frame):
+        n = self.led_w * self.led_h
+        if frame is None or len(frame) != n:
+            self.led_preview[:] = 0
+            return
+        arr = np.asarray(frame, dtype=np.float32).reshape(self.led_h, self.led_w, 3)
+        self.led_preview = np.clip(arr * self.preview_gain, 0, 255).astype(np.uint8)
+
     def set_status(self, text: str):
         self.status = (text or "")[:34]
 
+    def set_page(self, page: str):
+        self.page = "debug" if str(page).lower() == "debug" else "main"
+
+    def set_debug(self, lines):
+        self.debug = [str(x)[:40] for x in (lines or ())][:10]
+
     def set_bt(self, *, connected: bool, device_name: str = "", device_addr: str = ""):
         self.bt_connected = bool(connected)
         self.bt_name = (device_name or "")[:22]
         self.bt_addr = (device_addr or "")[:22]
 
-    def set_track(self, *, artist: str = "", title: str = "", album: str = ""):
-        self.artist = (artist or "")[:32]
-        self.title = (title or "")[:32]
+    def set_track(self, *, artist: str = "", title: str = "", album: str = "", cover_url: str = ""):
+        # artysta/tytuł przewijane (Marquee), więc tylko rozsądny limit
+        self.artist = (artist or "")[:160]
+        self.title = (title or "")[:160]
         self.album = (album or "")[:32]
+        self.cover_url = str(cover_url or "")
+        self.covers.request(self.cover_url)
+
+    def set_playback(self, *, position_ms: int = 0, duration_ms: int = 0, playing: bool = False):
+        self.position_ms = max(0, int(position_ms))
+        self.duration_ms = max(0, int(duration_ms))
+        self.playing = bool(playing)
+
+    @staticmethod
+    def _mmss(ms: int) -> str:
+        s = int(ms) // 1000
+        return f"{s // 60}:{s % 60:02d}"
 
     def close(self):
+        self.covers.close()
         try:
-            self.spi.close()
-        except Exception:
-            pass
-        try:
-            lgpio.gpiochip_close(self.gh)
+            self.bus.close()
         except Exception:
             pass
 
     def _w(self, pin, val):
-        lgpio.gpio_write(self.gh, pin, 1 if val else 0)
+        self.bus.gpio_write(pin, 1 if val else 0)
 
     def _cs_low(self):
         if self.CS is not None:
@@ -177,7 +224,7 @@ class LCDUI:
     def _cmd(self, c: int):
         self._w(self.DC, 0)
         self._cs_low()
-        self.spi.writebytes([c & 0xFF])
+        self.bus.spi_write([c & 0xFF])
         self._cs_high()
 
     def _data(self, buf):
@@ -185,7 +232,7 @@ class LCDUI:
             return
         self._w(self.DC, 1)
         self._cs_low()
-        self.spi.writebytes(list(buf))
+        self.bus.spi_write(list(buf))
         self._cs_high()
 
     def _reset(self):
@@ -220,33 +267,148 @@ class LCDUI:
         self._data([y0 >> 8, y0 & 0xFF, y1 >> 8, y1 & 0xFF])
         self._cmd(0x2C)
 
-    def _img_to_rgb565(self, img240x320: Image.Image) -> bytearray:
-        img = img240x320.convert("RGB")
-        px = img.load()
-        out = bytearray(self.WP * self.HP * 2)
-        i = 0
-        for y in range(self.HP):
-            for x in range(self.WP):
-                r, g, b = px[x, y]
-                v = ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
-                out[i] = (v >> 8) & 0xFF
-                out[i + 1] = v & 0xFF
-                i += 2
+    _rgb565 = staticmethod(rgb565)
+
+    def _to_panel(self, px: np.ndarray) -> np.ndarray:
+        # to samo co img.rotate(rotate, expand=True) + ImageOps.mirror, tylko na tablicy
+        out = np.rot90(px, k=self.rotate // 90)
+        if self.mirror:
+            out = np.fliplr(out)
         return out
 
-    def _display_240x320(self, img240x320: Image.Image):
-        self._set_window(0, 0, self.WP - 1, self.HP - 1)
-        buf = self._img_to_rgb565(img240x320)
+    def _push_window(self, x0, y0, x1, y1, px: np.ndarray):
+        # kopia tego, co jest na panelu: nic się nie zmieniło -> nic nie wysyłamy,
+        # inaczej tylko prostokąt obejmujący zmienione piksele
+        shadow = self._shadow[y0 : y1 + 1, x0 : x1 + 1]
+        if self._shadow_ok and shadow.shape == px.shape:
+            diff = shadow != px
+            rows = np.flatnonzero(diff.any(axis=1))
+            if rows.size == 0:
+                self.suppressed += 1
+                return
+            cols = np.flatnonzero(diff.any(axis=0))
+            r0, r1, c0, c1 = int(rows[0]), int(rows[-1]), int(cols[0]), int(cols[-1])
+            px = px[r0 : r1 + 1, c0 : c1 + 1]
+            shadow = shadow[r0 : r1 + 1, c0 : c1 + 1]
+            x0, y0, x1, y1 = x0 + c0, y0 + r0, x0 + c1, y0 + r1
+        shadow[...] = px
+        self.pushed += 1
+        self.px_pushed += px.size
+
+        self._set_window(x0, y0, x1, y1)
+        buf = np.ascontiguousarray(px, dtype=">u2").tobytes()
         self._w(self.DC, 1)
         self._cs_low()
         chunk = 4096
         for i in range(0, len(buf), chunk):
-            self.spi.writebytes(buf[i : i + chunk])
+            self.bus.spi_write(buf[i : i + chunk])
         self._cs_high()
 
+    def _display_px(self, px: np.ndarray):
+        if px.shape != (self.HP, self.WP):
+            ys = (np.arange(self.HP) * px.shape[0]) // self.HP
+            xs = (np.arange(self.WP) * px.shape[1]) // self.WP
+            px = px[ys[:, None], xs[None, :]]
+        self._push_window(0, 0, self.WP - 1, self.HP - 1, px)
+
     def _fill_black(self):
-        img = Image.new("RGB", (self.WP, self.HP), (0, 0, 0))
-        self._display_240x320(img)
+        self._shadow_ok = False
+        self._display_px(np.zeros((self.HP, self.WP), dtype=np.uint16))
+        self._shadow_ok = True
+
+    def _panel_rect(self, x0, y0, x1, y1):
+        """Prostokąt logiczny -> prostokąt panelu po obrocie/lustrze (None gdy panel jest skalowany)."""
+        mask = np.zeros((self.H, self.W), dtype=bool)
+        mask[y0 : y1 + 1, x0 : x1 + 1] = True
+        m = self._to_panel(mask)
+        if m.shape != (self.HP, self.WP):
+            return None
+        ys, xs = np.nonzero(m)
+        return (int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max()))
+
+    def _push_logical(self, px: np.ndarray, panel_rect):
+        if panel_rect is None:
+            return
+        self._push_window(*panel_rect, self._to_panel(px))
+
+    # ---------- live pane ----------
+
+    def _pane_setup(self):
+        x0, y0, x1, y1 = self.PANE
+        self.pane_w = x1 - x0 + 1
+        self.pane_h = y1 - y0 + 1
+
+        self._pane_panel_rect = self._panel_rect(x0, y0, x1, y1)
+        self.pane_fast = self._pane_panel_rect is not None
+
+        # spektrum: 16 słupków po 4px + 1px przerwy, podgląd LED: 4px na diodę
+        nb = self.spectrum.shape[0]
+        self.spec_w = nb * 5
+        col = np.arange(self.spec_w)
+        self._spec_band = np.where(col % 5 < 4, col // 5, -1)
+
+        self.prev_scale = max(1, min(self.pane_h // self.led_h, (self.pane_w - self.spec_w - 8) // self.led_w))
+        self.prev_x0 = self.pane_w - self.led_w * self.prev_scale
+
+        lo = np.array(self._mul(self.accent, self.dim), dtype=np.float32)
+        hi = np.array(self._mul((230, 240, 255), self.dim), dtype=np.float32)
+        k = np.linspace(1.0, 0.0, self.pane_h, dtype=np.float32)[:, None]
+        self._spec_rows = self._rgb565((lo + (hi - lo) * k).astype(np.uint8))[:, None]
+
+    def _pane_px(self) -> np.ndarray:
+        ph = self.pane_h
+        px = np.full((ph, self.pane_w), self._rgb565(np.array(self.bg, dtype=np.uint8)), dtype=np.uint16)
+
+        heights = (self.spectrum * ph).astype(np.int32)
+        col_h = np.where(self._spec_band >= 0, heights[np.maximum(self._spec_band, 0)], 0)
+        lit = np.arange(ph)[:, None] >= (ph - col_h)[None, :]
+        px[:, : self.spec_w] = np.where(lit, self._spec_rows, px[:, : self.spec_w])
+
+        # y=0 matrycy jest na dole, więc odwracamy w pionie
+        s = self.prev_scale
+        prev = (np.flipud(self.led_preview).astype(np.float32) * self.dim).astype(np.uint8)
+        prev = np.repeat(np.repeat(self._rgb565(prev), s, axis=0), s, axis=1)
+        py0 = (ph - prev.shape[0]) // 2
+        px[py0 : py0 + prev.shape[0], self.prev_x0 : self.prev_x0 + prev.shape[1]] = prev
+        return px
+
+    def _marquee_setup(self):
+        def line_h(font):
+            try:
+                asc, desc = font.getmetrics()
+                return asc + desc
+            except Exception:
+                return 16
+
+        # artysta kończy się przed okładką (COVER), tytuł idzie pod nią na całą szerokość
+        self.mq_artist = Marquee((18, 130, self.COVER[0] - 24, line_h(self.font_big)), speed=30.0)
+        self.mq_title = Marquee((18, 155, self.W - 38, line_h(self.font)), speed=30.0)
+        self._mq_rects = {
+            id(m): self._panel_rect(m.x, m.y, m.x + m.w - 1, m.y + m.h - 1)
+            for m in (self.mq_artist, self.mq_title)
+        }
+
+    def render_live(self):
+        """
+        Szybka ścieżka między pełnymi klatkami, jako małe okna SPI:
+        mic -> spektrum + podgląd LED, bt -> przesunięcie przewijanych tytułów.
+        """
+        if self.page == "debug":
+            return
+        if self.mode == "mic":
+            if not self.pane_fast:
+                self.render()
+                return
+            x0, y0, x1, y1 = self._pane_panel_rect
+            self._push_window(x0, y0, x1, y1, self._to_panel(self._pane_px()))
+            return
+
+        if not self.bt_connected:
+            return
+        now = time.monotonic()
+        for m in (self.mq_artist, self.mq_title):
+            if m.scrolling and m.moved(now):
+                self._push_logical(m.window(now), self._mq_rects[id(m)])
 
     @staticmethod
     def _clamp8(x: int) -> int:
@@ -264,7 +426,13 @@ class LCDUI:
         s = (s or "").strip()
         return s if len(s) <= n else (s[: max(0, n - 1)] + "…")
 
-    def render(self):
+    def _chrome(self) -> np.ndarray:
+        """Ramki, zakładki i stałe etykiety danego trybu (RGB565), rysowane raz przez PIL."""
+        key = "debug" if self.page == "debug" else self.mode
+        px = self._chrome_cache.get(key)
+        if px is not None:
+            return px
+
         ACC = self._mul(self.accent, self.dim)
         TXT = self._mul((230, 240, 255), self.dim)
         SUB = self._mul((110, 130, 150), self.dim)
@@ -275,7 +443,6 @@ class LCDUI:
 
         d.rectangle((0, 0, self.W - 1, 34), fill=(0, 0, 0), outline=GRID, width=2)
         d.text((10, 7), "VISUALIZER", fill=TXT, font=self.font)
-        d.text((170, 7), self._ell(f"FX:{self.effect}", 12), fill=SUB, font=self.font)
 
         tab_y0, tab_y1 = 40, 72
 
@@ -289,6 +456,14 @@ class LCDUI:
             )
             d.text((x0 + 18, tab_y0 + 9), label, fill=(ACC if active else SUB), font=self.font)
 
+        if key == "debug":
+            d.text((170, 7), "DEBUG", fill=ACC, font=self.font)
+            d.rectangle((10, 40, self.W - 10, self.H - 10), fill=(0, 0, 0), outline=GRID, width=2)
+            px = self._rgb565(np.asarray(img))
+            px.setflags(write=False)
+            self._chrome_cache[key] = px
+            return px
+
         tab(10, "MIC", self.mode == "mic")
         tab(110, "BT", self.mode == "bt")
 
@@ -296,43 +471,80 @@ class LCDUI:
 
         if self.mode == "mic":
             d.text((18, 86), "AUDIO", fill=ACC, font=self.font)
-            d.text((18, 106), f"RMS {self.rms:.3f}", fill=TXT, font=self.font_small)
-            d.text((18, 124), f"B  {self.bass:.2f}", fill=SUB, font=self.font_small)
-            d.text((18, 140), f"M  {self.mid:.2f}", fill=SUB, font=self.font_small)
-            d.text((18, 156), f"T  {self.treble:.2f}", fill=SUB, font=self.font_small)
+            d.text((150, 86), "SPECTRUM", fill=ACC, font=self.font)
 
-            rx = 150
-            d.text((rx, 86), "MODE", fill=ACC, font=self.font)
-            d.text((rx, 106), "MIC INPUT", fill=TXT, font=self.font_small)
+        d.rectangle((10, self.H - 38, self.W - 10, self.H - 10), fill=(0, 0, 0), outline=GRID, width=2)
+
+        px = self._rgb565(np.asarray(img))
+        px.setflags(write=False)
+        self._chrome_cache[key] = px
+        return px
+
+    def render(self):
+        ACC = self._mul(self.accent, self.dim)
+        TXT = self._mul((230, 240, 255), self.dim)
+        SUB = self._mul((110, 130, 150), self.dim)
+
+        px = self._chrome().copy()
+        text = self.glyphs.draw      # stałe / rzadko zmieniane napisy
+        num = self.glyphs.glyphs     # liczby: kafelki pojedynczych znaków
+
+        if self.page == "debug":
+            for i, line in enumerate(self.debug):
+                num(px, (18, 48 + i * 18), line, self.font_small, ACC if i == 0 else TXT)
+            self._display_px(self._to_panel(px))
+            return
+
+        text(px, (170, 7), self._ell(f"FX:{self.effect}", 12), self.font, SUB)
+
+        if self.mode == "mic":
+            text(px, (18, 106), "RMS", self.font_small, TXT)
+            num(px, (18 + 4 * self._adv_small, 106), f"{self.rms:.3f}", self.font_small, TXT)
+            for y, label, v in ((124, "B", self.bass), (140, "M", self.mid), (156, "T", self.treble)):
+                text(px, (18, y), label, self.font_small, SUB)
+                num(px, (18 + 3 * self._adv_small, y), f"{v:.2f}", self.font_small, SUB)
+
+            num(px, (18, 182), self.status, self.font_small, TXT)
 
         else:
             if self.bt_connected:
-                d.text((18, 110), "NOW PLAYING", fill=ACC, font=self.font_small)
-                artist_txt = self._ell(self.artist or "Unknown Artist", 24)
-                d.text((18, 130), artist_txt, fill=TXT, font=self.font_big)
-
-                title_txt = self._ell(self.title or "Unknown Title", 28)
-                d.text((18, 155), title_txt, fill=TXT, font=self.font)
+                text(px, (18, 110), "NOW PLAYING", self.font_small, ACC)
+                cover = self.covers.get(self.cover_url)
+                if cover is not None:
+                    cx, cy = self.COVER
+                    px[cy : cy + cover.shape[0], cx : cx + cover.shape[1]] = cover
+
+                now = time.monotonic()
+                self.mq_artist.set_text(self.artist or "Unknown Artist", self.font_big, TXT, self.glyphs)
+                self.mq_title.set_text(self.title or "Unknown Title", self.font, TXT, self.glyphs)
+                for m in (self.mq_artist, self.mq_title):
+                    px[m.y : m.y + m.h, m.x : m.x + m.w] = m.window(now)
 
                 if self.album:
-                    album_txt = self._ell(self.album, 28)
-                    d.text((18, 175), album_txt, fill=SUB, font=self.font_small)
+                    text(px, (18, 175), self._ell(self.album, 24), self.font_small, SUB)
 
-                d.text((18, 200), "DEVICE", fill=ACC, font=self.font_small)
-                d.text((18, 216), self._ell(self.bt_name, 24), fill=SUB, font=self.font_small)
-            else:
-                d.text((18, 110), "NOT CONNECTED", fill=SUB, font=self.font)
+                if self.duration_ms > 0:
+                    # czas po prawej w wierszu albumu + pasek postępu pod nim
+                    t = f"{self._mmss(self.position_ms)}/{self._mmss(self.duration_ms)}"
+                    num(px, (self.W - 18 - len(t) * self._adv_small, 175), t, self.font_small, TXT if self.playing else SUB)
 
-        d.rectangle((10, self.H - 38, self.W - 10, self.H - 10), fill=(0, 0, 0), outline=GRID, width=2)
-        d.text((18, self.H - 32), f"INT {self.intensity:.2f}", fill=SUB, font=self.font_small)
-        d.text((120, self.H - 32), f"GAIN {self.gain:.2f}", fill=SUB, font=self.font_small)
-        d.text((230, self.H - 32), f"SM {self.smoothing:.2f}", fill=SUB, font=self.font_small)
+                    x0, x1 = 18, self.W - 18
+                    k = min(1.0, self.position_ms / float(self.duration_ms))
+                    xf = x0 + int((x1 - x0) * k)
+                    px[192:195, x0:x1] = self._rgb565(np.array(self._mul((0, 50, 90), self.dim), dtype=np.uint8))
+                    px[192:195, x0:xf] = self._rgb565(np.array(ACC if self.playing else SUB, dtype=np.uint8))
 
-        out = img.rotate(self.rotate, expand=True)
-        if self.mirror:
-            out = ImageOps.mirror(out)
+                text(px, (18, 200), "DEVICE", self.font_small, ACC)
+                text(px, (18, 216), self._ell(self.bt_name, 24), self.font_small, SUB)
+            else:
+                text(px, (18, 110), "NOT CONNECTED", self.font, SUB)
+
+        for x, label, v in ((18, "INT", self.intensity), (120, "GAIN", self.gain), (230, "SM", self.smoothing)):
+            text(px, (x, self.H - 32), label, self.font_small, SUB)
+            num(px, (x + (len(label) + 1) * self._adv_small, self.H - 32), f"{v:.2f}", self.font_small, SUB)
 
-        if out.size != (self.WP, self.HP):
-            out = out.resize((self.WP, self.HP))
+        if self.mode == "mic":
+            x0, y0, x1, y1 = self.PANE
+            px[y0 : y1 + 1, x0 : x1 + 1] = self._pane_px()
 
-        self._display_240x320(out)
+        self._display_px(self._to_panel(px))
@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+
+
+class Marquee:
+    """
+    Scrolling text line. The full string is rasterized once into an off-screen
+    RGB565 strip; window() just slices the visible part at the current offset,
+    so a tick costs a memcpy of w*h pixels and no text rendering at all.
+    """
+    def __init__(self, rect, speed=30.0, gap=40, pause=1.5):
+        self.x, self.y, self.w, self.h = (int(v) for v in rect)
+        self.speed = float(speed)   # px/s
+        self.gap = int(gap)         # odstęp między końcem a powtórzeniem
+        self.pause = float(pause)   # postój na początku po zmianie tekstu
+
+        self._key = None
+        self._strip = np.zeros((self.h, self.w), dtype=np.uint16)
+        self._period = 0
+        self._t0 = time.monotonic()
+        self._last_off = -1
+
+    @property
+    def scrolling(self) -> bool:
+        return self._period > 0
+
+    def set_text(self, text: str, font, color, glyphs):
+        key = (text, font, tuple(color))
+        if key == self._key:
+            return
+        self._key = key
+        self._t0 = time.monotonic()
+        self._last_off = -1
+
+        tile, _ = glyphs.string_tile(text, font, color) if text else (np.zeros((1, 1), np.uint16), None)
+        th, tw = tile.shape
+        h = min(self.h, th)
+
+        if tw <= self.w:
+            strip = np.zeros((self.h, self.w), dtype=np.uint16)
+            strip[:h, :tw] = tile[:h]
+            self._period = 0
+        else:
+            # tekst + przerwa, sklejone dwa razy -> okno nigdy nie wychodzi poza tablicę
+            self._period = tw + self.gap
+            one = np.zeros((self.h, self._period), dtype=np.uint16)
+            one[:h, :tw] = tile[:h]
+            strip = np.concatenate((one, one[:, : self.w]), axis=1)
+        self._strip = strip
+
+    def offset(self, now=None) -> int:
+        if self._period <= 0:
+            return 0
+        t = (time.monotonic() if now is None else now) - self._t0 - self.pause
+        if t <= 0:
+            return 0
+        return int(t * self.speed) % self._period
+
+    def window(self, now=None) -> np.ndarray:
+        off = self.offset(now)
+        self._last_off = off
+        return self._strip[:, off : off + self.w]
+
+    def moved(self, now=None) -> bool:
+        return self.offset(now) != self._last_off